@@ -74,6 +74,21 @@ class RpcHandle(Generic[RpcRequest, RpcResponse, RpcStub], abc.ABC):
     def __call__(self, rpc_request: RpcRequest) -> RpcResponse:
         raise NotImplementedError
 
+    def call_batch(self, rpc_requests: List[RpcRequest]) -> List[RpcResponse]:
+        """Send several requests in a single call, for offline processing.
+
+        Returns:
+            The responses, in the order of the requests
+        """
+        raise NotImplementedError
+
+    def is_ready(self) -> bool:
+        """Whether the remote end is ready to serve requests.
+
+        Implementations that are not ready are skipped when processing a message.
+        """
+        return True
+
 
 @dataclass
 class Implementation:
@@ -152,3 +167,35 @@ def execute_cloud_separate_thread(
     logger.info("response from server id=%d" % response.req_id)
 
     heapq.heappush(result_heap, (imp.priority, time.time(), response))
+
+
+def execute_cloud_batch(
+    imp: Implementation,
+    batch: List[Tuple[Timestamp, InputT]],
+    cloud_ex_times: defaultdict,
+) -> List[OutputT]:
+    """Execute a cloud implementation on a batch of messages.
+
+    Deadlines returned by the message handler are ignored.
+
+    Args:
+        imp: The cloud implementation to execute
+        batch: List of (timestamp, input message) tuples
+        cloud_ex_times: Dictionary to track execution times
+
+    Returns:
+        The outputs, in the order of the batch
+    """
+    start_time = time.time()
+    rpc_requests = [
+        imp.message_handler(timestamp, input_message)[0]
+        for timestamp, input_message in batch
+    ]
+    responses = imp.rpc_handle.call_batch(rpc_requests)
+    elapsed_time = time.time() - start_time
+    cloud_ex_times[imp.priority].append(elapsed_time / len(batch))
+    logger.info(
+        f"Cloud implementation #{imp.priority} took {elapsed_time:.3f} s "
+        f"for a batch of {len(batch)}"
+    )
+    return [imp.response_handler(response) for response in responses]
@@ -1,10 +1,13 @@
 import abc
 import heapq
 import logging
+import math
 import time
-from collections import defaultdict
-from threading import Semaphore, Thread
-from typing import Any, Generic, List, Tuple
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from threading import Condition, Semaphore, Thread
+from typing import Any, Generic, Iterable, Iterator, List, Optional, Tuple
 
 from core.cloud_executor import (
     Deadline,
@@ -17,6 +20,7 @@ from core.cloud_executor import (
     RpcStub,
     Timestamp,
     configure_logging,
+    execute_cloud_batch,
     execute_cloud_separate_thread,
     logger,
     register_implementation,
@@ -53,7 +57,8 @@ def wait_for_first_completed_thread(
 
     Args:
         threads: List of threads to monitor
-        start_time: Time when processing started
+        start_time: Time when processing started, used to resolve a relative
+            `min_deadline`
         min_deadline: Minimum deadline across all implementations
         local_result_heap: Heap storing local results
         cloud_result_heap: Heap storing cloud results
@@ -61,25 +66,20 @@ def wait_for_first_completed_thread(
     Returns:
         Tuple of (thread_completed flag, result)
     """
-    thread_completed = False
+    deadline_time = min_deadline.to_absolute(start_time).seconds
 
-    while not thread_completed:
-        elapsed_time = time.time() - start_time
-        if elapsed_time > min_deadline.seconds:
-            break
-
-        for thread in threads:
-            if not thread.is_alive():
-                coordinator_logger.info("finished execution before deadline")
-                thread_completed = True
-                break
+    # threads push their result before exiting, so a non-empty heap means that
+    # a thread completed
+    while not local_result_heap and not cloud_result_heap:
+        if time.time() > deadline_time:
+            raise Exception("No threads finished before deadline!")
+        if not any(thread.is_alive() for thread in threads) and not (
+            local_result_heap or cloud_result_heap
+        ):
+            raise Exception("All threads failed before deadline!")
         time.sleep(0.001)
 
-    if not thread_completed:
-        raise Exception("No threads finished before deadline!")
-
-    while not local_result_heap and not cloud_result_heap:
-        time.sleep(0.00001)
+    coordinator_logger.info("finished execution before deadline")
 
     if local_result_heap:
         result = heapq.heappop(local_result_heap)
@@ -102,7 +102,6 @@ class SpeculativeOperator(abc.ABC, Generic[InputT, OutputT]):
     def __init__(self):
         self.implementations = []
         self.thread = None
-        self.local_result = None
         self.cloud_ex_times = defaultdict(list)
         self.local_ex_times = []
 
@@ -110,24 +109,84 @@ class SpeculativeOperator(abc.ABC, Generic[InputT, OutputT]):
     def execute_local(self, input_message: InputT) -> OutputT:
         raise NotImplementedError()
 
+    def is_local_ready(self) -> bool:
+        """Whether local execution is ready, e.g. its model has been loaded.
+
+        Until it is, messages are only processed in the cloud.
+        """
+        return True
+
+    def wait_until_ready(self, timeout: float) -> bool:
+        """Block until local execution or a cloud implementation is ready.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            True once something is ready, False if nothing became ready within
+            the timeout
+        """
+        wait_until = time.time() + timeout
+        while not (
+            self.is_local_ready()
+            or any(imp.rpc_handle.is_ready() for imp in self.implementations)
+        ):
+            if time.time() > wait_until:
+                return False
+            time.sleep(0.1)
+        return True
+
     def execute_local_separate_thread(self, input_message: InputT, result_heap: List):
         start_time = time.time()
-        self.local_result = self.execute_local(input_message)
+        try:
+            local_result = self.execute_local(input_message)
+        except Exception as e:
+            # leave it to the cloud implementations to produce a result
+            coordinator_logger.warning(f"Local execution failed: {e}")
+            return
         elapsed_time = time.time() - start_time
         self.local_ex_times.append(elapsed_time)
         coordinator_logger.info(f"Local ex took {elapsed_time:.3f} s")
-        heapq.heappush(result_heap, (-1, time.time(), self.local_result))
+        heapq.heappush(result_heap, (-1, time.time(), local_result))
 
-    def process_message(self, timestamp: Timestamp, input_message: InputT) -> OutputT:
+    def process_message(
+        self,
+        timestamp: Timestamp,
+        input_message: InputT,
+        deadline: Optional[Deadline] = None,
+    ) -> OutputT:
+        """Speculatively process a message locally and in the cloud.
+
+        Args:
+            timestamp: Timestamp or identifier for the message
+            input_message: The input message to process
+            deadline: Optional deadline imposed by the caller (e.g. the remaining
+                budget of a pipeline). The effective deadline is the earliest of
+                this and the deadlines returned by the message handlers.
+        """
         coordinator_logger.info("executing process_message")
         local_result_heap = []
         cloud_result_heap = []
 
-        self.local_thread = Thread(
-            target=self.execute_local_separate_thread,
-            args=(input_message, local_result_heap),
-        )
-        self.local_thread.start()
+        # per-call state stays local, so that messages can be processed
+        # concurrently (e.g. by MultiStreamOperator)
+        local_threads = []
+        if self.is_local_ready():
+            local_thread = Thread(
+                target=self.execute_local_separate_thread,
+                args=(input_message, local_result_heap),
+            )
+            local_thread.start()
+            local_threads.append(local_thread)
+        else:
+            coordinator_logger.info("local execution not ready, running cloud-only")
+
+        implementations = [
+            imp for imp in self.implementations if imp.rpc_handle.is_ready()
+        ]
+        if not local_threads and not implementations:
+            raise Exception("Neither local nor cloud execution is ready!")
+
         deadlines = []
         sem = Semaphore(0)
 
@@ -145,7 +204,7 @@ class SpeculativeOperator(abc.ABC, Generic[InputT, OutputT]):
                     self.cloud_ex_times,
                 ),
             )
-            for imp in sorted(self.implementations, key=lambda x: x.priority)
+            for imp in sorted(implementations, key=lambda x: x.priority)
         ]
 
         start_time = time.time()
@@ -155,10 +214,18 @@ class SpeculativeOperator(abc.ABC, Generic[InputT, OutputT]):
         for thread in cloud_threads:
             sem.acquire()
 
-        # find min deadline
-        min_deadline = min(deadlines, key=lambda deadline: deadline.seconds)
+        # find min deadline, resolving relative deadlines against the start time
+        absolute_deadlines = [d.to_absolute(start_time) for d in deadlines]
+        if deadline is not None:
+            absolute_deadlines.append(deadline.to_absolute(start_time))
+        # without any deadline (local execution only), wait for the local result
+        min_deadline = min(
+            absolute_deadlines,
+            key=lambda d: d.seconds,
+            default=Deadline.absolute(math.inf),
+        )
 
-        threads = [self.local_thread] + cloud_threads
+        threads = local_threads + cloud_threads
 
         # Wait for first completed thread and get result
         result = wait_for_first_completed_thread(
@@ -167,6 +234,167 @@ class SpeculativeOperator(abc.ABC, Generic[InputT, OutputT]):
 
         return result
 
+    def execute_local_batch(
+        self, batch: List[Tuple[Timestamp, InputT]]
+    ) -> List[OutputT]:
+        """Execute the local implementation on a batch of messages."""
+        start_time = time.time()
+        outputs = [self.execute_local(input_message) for _, input_message in batch]
+        self.local_ex_times.append((time.time() - start_time) / len(batch))
+        return outputs
+
+    def process_iter(
+        self,
+        messages: Iterable[Tuple[Timestamp, InputT]],
+        batch_size: int = 16,
+        batches_in_flight: int = 2,
+        use_local: bool = False,
+        max_retries: int = 2,
+        lane_timeout: float = 30.0,
+    ) -> Iterator[OutputT]:
+        """Process messages for maximum throughput, without speculation.
+
+        Messages are grouped into batches, which are spread over all registered
+        cloud implementations using `RpcHandle.call_batch`, with up to
+        `batches_in_flight` batches in flight per implementation. Each batch is
+        executed by a single implementation, and deadlines are ignored. An
+        implementation that fails a batch receives no further batches, and the
+        failed batch is resubmitted to the remaining implementations.
+
+        Args:
+            messages: Iterable of (timestamp, input message) tuples
+            batch_size: Number of messages per batch
+            batches_in_flight: Maximum number of batches in flight per cloud
+                implementation
+            use_local: If True, local execution processes one batch at a time
+                whenever all cloud implementations are busy
+            max_retries: Maximum number of times a failed batch is resubmitted
+            lane_timeout: Maximum time in seconds to wait for an implementation
+                that is ready and below its number of batches in flight
+
+        Yields:
+            The outputs, in the order of the messages
+        """
+        # a lane is a cloud implementation, or local execution (None)
+        lanes = sorted(self.implementations, key=lambda x: x.priority)
+        capacities = [batches_in_flight] * len(lanes)
+        if use_local:
+            lanes.append(None)
+            capacities.append(1)
+        if not lanes:
+            raise Exception("No implementations to process messages with!")
+
+        in_flight = [0] * len(lanes)
+        # lanes that failed a batch, and receive no further batches
+        failed = set()
+        condition = Condition()
+        # [batch, future, retries] of the batches in flight, and of the completed
+        # batches waiting until all preceding batches are yielded
+        pending = deque()
+        max_pending = 2 * sum(capacities)
+
+        def acquire_lane() -> int:
+            wait_until = time.time() + lane_timeout
+            with condition:
+                while True:
+                    if len(failed) == len(lanes):
+                        raise Exception("Every implementation failed!")
+                    # lanes are ordered so that local execution is the last resort
+                    free = [
+                        i
+                        for i, lane in enumerate(lanes)
+                        if i not in failed
+                        and in_flight[i] < capacities[i]
+                        and (
+                            self.is_local_ready()
+                            if lane is None
+                            else lane.rpc_handle.is_ready()
+                        )
+                    ]
+                    if free:
+                        index = min(
+                            free, key=lambda i: (lanes[i] is None, in_flight[i])
+                        )
+                        in_flight[index] += 1
+                        return index
+                    remaining = wait_until - time.time()
+                    if remaining <= 0:
+                        raise Exception(
+                            f"No implementation available after {lane_timeout} s!"
+                        )
+                    condition.wait(timeout=min(remaining, 0.1))
+
+        def run_batch(index: int, batch: List[Tuple[Timestamp, InputT]]):
+            try:
+                if lanes[index] is None:
+                    return self.execute_local_batch(batch)
+                return execute_cloud_batch(lanes[index], batch, self.cloud_ex_times)
+            except Exception as e:
+                coordinator_logger.warning(
+                    f"Batch failed on lane {index}, which gets no more batches: {e}"
+                )
+                with condition:
+                    failed.add(index)
+                raise
+            finally:
+                with condition:
+                    in_flight[index] -= 1
+                    condition.notify()
+
+        def resubmit_failed():
+            # lanes are acquired here rather than in the executor's threads, so
+            # that a retry never holds a thread needed by the batch it waits for
+            for entry in pending:
+                batch, future, retries = entry
+                if not future.done() or future.exception() is None:
+                    continue
+                if retries >= max_retries:
+                    raise future.exception()
+                coordinator_logger.warning(
+                    f"Resubmitting failed batch (retry {retries + 1})"
+                )
+                entry[1] = executor.submit(run_batch, acquire_lane(), batch)
+                entry[2] = retries + 1
+
+        def completed_outputs(max_size: int) -> Iterator[OutputT]:
+            # yield the outputs of the completed batches in order, waiting while
+            # more than `max_size` batches are pending
+            while pending:
+                resubmit_failed()
+                future = pending[0][1]
+                if future.done():
+                    if future.exception() is None:
+                        yield from pending.popleft()[1].result()
+                elif len(pending) > max_size:
+                    wait(
+                        [entry[1] for entry in pending if not entry[1].done()],
+                        return_when=FIRST_COMPLETED,
+                    )
+                else:
+                    return
+
+        messages = iter(messages)
+        with ThreadPoolExecutor(max_workers=sum(capacities)) as executor:
+            while batch := list(islice(messages, batch_size)):
+                yield from completed_outputs(max_pending - 1)
+                future = executor.submit(run_batch, acquire_lane(), batch)
+                pending.append([batch, future, 0])
+                yield from completed_outputs(max_pending)
+
+            yield from completed_outputs(0)
+
+    def process_batch(
+        self, messages: Iterable[Tuple[Timestamp, InputT]], **kwargs
+    ) -> List[OutputT]:
+        """Process messages for maximum throughput, without speculation.
+
+        Accepts the same keyword arguments as `process_iter`.
+
+        Returns:
+            The outputs, in the order of the messages
+        """
+        return list(self.process_iter(messages, **kwargs))
+
     def use_cloud(
         self,
         rpc_handle: RpcHandle[RpcRequest, RpcResponse, RpcStub],
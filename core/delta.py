@@ -0,0 +1,226 @@
+import io
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 16
+DEFAULT_KEYFRAME_INTERVAL = 30
+DEFAULT_MAX_CHANGED_FRACTION = 0.6
+
+
+@dataclass
+class EncodedFrame:
+    """A frame encoded as a keyframe or as a delta to the previous frame.
+
+    Keyframes carry a PNG image. Deltas carry a bitmask of the blocks that
+    changed since frame `base_seq` and the zlib-compressed pixels of those
+    blocks, in row-major block order.
+    """
+
+    seq: int
+    keyframe: bool
+    image_data: bytes = b""
+    base_seq: int = -1
+    block_size: int = 0
+    block_mask: bytes = b""
+    block_data: bytes = b""
+
+    @property
+    def num_bytes(self) -> int:
+        return len(self.image_data) + len(self.block_mask) + len(self.block_data)
+
+
+def pad_to_blocks(frame: np.ndarray, block_size: int) -> np.ndarray:
+    """Pad a (height, width, channels) frame to a multiple of the block size."""
+    height, width = frame.shape[:2]
+    pad_height = -height % block_size
+    pad_width = -width % block_size
+    if not pad_height and not pad_width:
+        return frame
+    return np.pad(frame, ((0, pad_height), (0, pad_width), (0, 0)), mode="edge")
+
+
+def as_blocks(frame: np.ndarray, block_size: int) -> np.ndarray:
+    """View a padded frame as (block rows, block size, block cols, block size, C)."""
+    height, width, channels = frame.shape
+    return frame.reshape(
+        height // block_size, block_size, width // block_size, block_size, channels
+    )
+
+
+class DeltaEncoder:
+    """Encodes consecutive frames of a stream as keyframes and block deltas.
+
+    Frames are split into square blocks, and only the blocks in which some pixel
+    differs from the reference by more than `threshold` are sent. With a
+    non-zero threshold, the reference is updated with the sent blocks only, so
+    that it always matches the frame reconstructed by the decoder.
+
+    A keyframe is sent for the first frame, every `keyframe_interval` frames,
+    when the frame size changes, when more than `max_changed_fraction` of the
+    blocks changed, and after `reset`.
+    """
+
+    def __init__(
+        self,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+        threshold: int = 0,
+        max_changed_fraction: float = DEFAULT_MAX_CHANGED_FRACTION,
+    ):
+        """
+        Args:
+            block_size: Width and height of a block in pixels
+            keyframe_interval: Maximum number of frames between keyframes
+            threshold: Maximum per-pixel difference of an unchanged block
+            max_changed_fraction: Fraction of changed blocks above which a
+                keyframe is sent instead of a delta
+        """
+        self.block_size = block_size
+        self.keyframe_interval = keyframe_interval
+        self.threshold = threshold
+        self.max_changed_fraction = max_changed_fraction
+
+        self.seq = 0
+        self.reference: Optional[np.ndarray] = None
+        self.frame_shape = None
+        self.frames_since_keyframe = 0
+        self.last_keyframe_bytes = 0
+
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    def reset(self):
+        """Forget the reference, so that the next frame is sent as a keyframe."""
+        self.reference = None
+
+    def encode(self, frame: np.ndarray) -> EncodedFrame:
+        """Encode a (height, width, 3) uint8 RGB frame.
+
+        Returns:
+            The encoded frame
+        """
+        seq = self.seq
+        self.seq += 1
+
+        if (
+            self.reference is None
+            or frame.shape != self.frame_shape
+            or self.frames_since_keyframe + 1 >= self.keyframe_interval
+        ):
+            return self.encode_keyframe(frame, seq)
+
+        padded = pad_to_blocks(frame, self.block_size)
+        diff = np.abs(padded.astype(np.int16) - self.reference.astype(np.int16))
+        block_diff = as_blocks(diff, self.block_size).max(axis=(1, 3, 4))
+        changed = block_diff > self.threshold
+        if changed.mean() > self.max_changed_fraction:
+            return self.encode_keyframe(frame, seq)
+
+        rows, cols = np.nonzero(changed)
+        blocks = as_blocks(padded, self.block_size)[rows, :, cols]
+        as_blocks(self.reference, self.block_size)[rows, :, cols] = blocks
+
+        encoded = EncodedFrame(
+            seq=seq,
+            keyframe=False,
+            base_seq=seq - 1,
+            block_size=self.block_size,
+            block_mask=np.packbits(changed).tobytes(),
+            block_data=zlib.compress(blocks.tobytes(), level=1),
+        )
+        self.frames_since_keyframe += 1
+        self.deltas += 1
+        self.bytes_sent += encoded.num_bytes
+        self.bytes_saved += max(0, self.last_keyframe_bytes - encoded.num_bytes)
+        return encoded
+
+    def encode_keyframe(self, frame: np.ndarray, seq: int) -> EncodedFrame:
+        """Encode a frame as a standalone PNG image and make it the reference."""
+        image_data = io.BytesIO()
+        Image.fromarray(frame).save(image_data, format="PNG")
+        encoded = EncodedFrame(
+            seq=seq, keyframe=True, image_data=image_data.getvalue()
+        )
+
+        self.reference = pad_to_blocks(frame, self.block_size).copy()
+        self.frame_shape = frame.shape
+        self.frames_since_keyframe = 0
+        self.last_keyframe_bytes = encoded.num_bytes
+        self.keyframes += 1
+        self.bytes_sent += encoded.num_bytes
+        return encoded
+
+    def stats(self) -> Dict[str, Any]:
+        """Bandwidth statistics of the stream.
+
+        Bytes saved are estimated by comparing each delta to the size of the
+        latest keyframe.
+        """
+        return {
+            "keyframes": self.keyframes,
+            "deltas": self.deltas,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+class DeltaDecoder:
+    """Reconstructs the frames of a stream encoded by a `DeltaEncoder`."""
+
+    def __init__(self):
+        self.reference: Optional[np.ndarray] = None
+        self.frame_shape = None
+        self.block_size = None
+        self.seq = -1
+
+    def decode(self, encoded: EncodedFrame) -> Optional[np.ndarray]:
+        """Reconstruct a frame.
+
+        Returns:
+            The (height, width, 3) frame, or None if the delta does not apply to
+            the current reference and the encoder must resync with a keyframe
+        """
+        if encoded.keyframe:
+            image = Image.open(io.BytesIO(encoded.image_data)).convert("RGB")
+            self.reference = np.array(image)
+            self.frame_shape = self.reference.shape
+            self.block_size = None
+            self.seq = encoded.seq
+            return self.reference.copy()
+
+        if self.reference is None or encoded.base_seq != self.seq:
+            logger.warning(
+                f"Delta based on frame {encoded.base_seq} does not apply to frame "
+                f"{self.seq}, resync required"
+            )
+            return None
+
+        height, width, channels = self.frame_shape
+        if encoded.block_size != self.block_size:
+            self.reference = pad_to_blocks(
+                self.reference[:height, :width], encoded.block_size
+            ).copy()
+            self.block_size = encoded.block_size
+
+        blocks = as_blocks(self.reference, self.block_size)
+        block_rows, block_cols = blocks.shape[0], blocks.shape[2]
+        changed = np.unpackbits(
+            np.frombuffer(encoded.block_mask, dtype=np.uint8),
+            count=block_rows * block_cols,
+        ).reshape(block_rows, block_cols)
+        rows, cols = np.nonzero(changed)
+        blocks[rows, :, cols] = np.frombuffer(
+            zlib.decompress(encoded.block_data), dtype=np.uint8
+        ).reshape(len(rows), self.block_size, self.block_size, channels)
+
+        self.seq = encoded.seq
+        return self.reference[:height, :width].copy()
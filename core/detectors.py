@@ -0,0 +1,270 @@
+import abc
+import io
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from PIL import Image
+
+# torch and transformers take seconds to import, so they are only imported when
+# a detector is created
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "facebook/detr-resnet-50"
+DEFAULT_THRESHOLD = 0.5
+ONNX_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "speculative-cloud-execution"
+)
+
+BACKENDS = ["pipeline", "quantized", "onnx"]
+WARM_UP_IMAGE_SIZE = (640, 480)
+
+
+def configure_threads(
+    intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None
+):
+    """Configure the number of threads PyTorch uses for CPU inference.
+
+    Args:
+        intra_op_threads: Threads used within an operator (e.g. a matmul)
+        inter_op_threads: Threads used to run independent operators in parallel
+    """
+    import torch
+
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # can only be set once, before any inter-op parallel work has started
+            logger.warning("Inter-op thread count already fixed, ignoring")
+
+
+class DetectorBackend(abc.ABC):
+    """Runs object detection on a single image.
+
+    Detections are returned in the format of the transformers object detection
+    pipeline, i.e. a list of dicts with `score`, `label` and `box` keys, where
+    `box` holds the `xmin`, `ymin`, `xmax` and `ymax` pixel coordinates.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def __call__(self, image: Image.Image) -> List[Dict]:
+        raise NotImplementedError
+
+
+class PipelineBackend(DetectorBackend):
+    """Unoptimized fp32 transformers pipeline."""
+
+    name = "pipeline"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, threshold=DEFAULT_THRESHOLD):
+        from transformers import pipeline
+
+        self.threshold = threshold
+        self.obj_detector = pipeline("object-detection", model=model_name)
+
+    def __call__(self, image: Image.Image) -> List[Dict]:
+        return self.obj_detector(image, threshold=self.threshold)
+
+
+class QuantizedBackend(PipelineBackend):
+    """Transformers pipeline with dynamic int8 quantization of linear layers.
+
+    The DETR encoder/decoder and prediction heads are dominated by linear layers,
+    whose weights are quantized ahead of time while activations are quantized on
+    the fly. The convolutional backbone stays in fp32.
+    """
+
+    name = "quantized"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, threshold=DEFAULT_THRESHOLD):
+        import torch
+
+        super().__init__(model_name, threshold)
+        self.obj_detector.model = torch.ao.quantization.quantize_dynamic(
+            self.obj_detector.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+
+class OnnxBackend(DetectorBackend):
+    """DETR exported to ONNX and run with ONNX Runtime.
+
+    The model is exported once and cached in `ONNX_CACHE_DIR`. Requires the
+    optional `onnx` and `onnxruntime` packages.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        threshold=DEFAULT_THRESHOLD,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        onnx_path: Optional[str] = None,
+    ):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(
+                "The onnx backend requires onnxruntime: pip install onnx onnxruntime"
+            ) from e
+        from transformers import AutoConfig, AutoImageProcessor
+
+        self.threshold = threshold
+        self.image_processor = AutoImageProcessor.from_pretrained(model_name)
+        self.id2label = AutoConfig.from_pretrained(model_name).id2label
+
+        if onnx_path is None:
+            onnx_path = os.path.join(
+                ONNX_CACHE_DIR, model_name.replace("/", "--") + ".onnx"
+            )
+        if not os.path.exists(onnx_path):
+            # the fp32 PyTorch model is only needed to export it
+            from transformers import AutoModelForObjectDetection
+
+            model = AutoModelForObjectDetection.from_pretrained(model_name)
+            export_onnx(model, onnx_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+        self.session = onnxruntime.InferenceSession(
+            onnx_path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(self, image: Image.Image) -> List[Dict]:
+        import torch
+        from transformers.models.detr.modeling_detr import DetrObjectDetectionOutput
+
+        image = image.convert("RGB")
+        inputs = self.image_processor(images=image, return_tensors="np")
+        logits, pred_boxes = self.session.run(
+            ["logits", "pred_boxes"], {"pixel_values": inputs["pixel_values"]}
+        )
+        outputs = DetrObjectDetectionOutput(
+            logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes)
+        )
+        result = self.image_processor.post_process_object_detection(
+            outputs,
+            threshold=self.threshold,
+            target_sizes=[(image.height, image.width)],
+        )[0]
+        return [
+            {
+                "score": score.item(),
+                "label": self.id2label[label.item()],
+                "box": dict(zip(("xmin", "ymin", "xmax", "ymax"), box.int().tolist())),
+            }
+            for score, label, box in zip(
+                result["scores"], result["labels"], result["boxes"]
+            )
+        ]
+
+
+def export_onnx(model: "torch.nn.Module", onnx_path: str):
+    """Export a DETR model to ONNX with dynamic batch and image sizes.
+
+    Args:
+        model: The DETR model to export
+        onnx_path: Path of the exported model
+    """
+    import torch
+
+    logger.info(f"Exporting model to {onnx_path}")
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    model.eval()
+    # the image processor resizes the shortest edge to 800 pixels
+    dummy_input = torch.zeros((1, 3, 800, 1066), dtype=torch.float32)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy_input,),
+            onnx_path,
+            input_names=["pixel_values"],
+            output_names=["logits", "pred_boxes"],
+            dynamic_axes={
+                "pixel_values": {0: "batch", 2: "height", 3: "width"},
+                "logits": {0: "batch"},
+                "pred_boxes": {0: "batch"},
+            },
+            opset_version=17,
+        )
+
+
+def create_detector(
+    backend: str = "pipeline",
+    model_name: str = DEFAULT_MODEL,
+    threshold: float = DEFAULT_THRESHOLD,
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+) -> DetectorBackend:
+    """Create an object detector, falling back to the plain pipeline on failure.
+
+    Args:
+        backend: One of `BACKENDS`
+        model_name: Hugging Face name of the object detection model
+        threshold: Minimum score of returned detections
+        intra_op_threads: Threads used within an operator. Defaults to the
+            framework default (usually the number of physical cores).
+        inter_op_threads: Threads used to run independent operators in parallel
+
+    Returns:
+        The object detector
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+
+    configure_threads(intra_op_threads, inter_op_threads)
+    try:
+        if backend == "quantized":
+            return QuantizedBackend(model_name, threshold)
+        if backend == "onnx":
+            return OnnxBackend(
+                model_name, threshold, intra_op_threads, inter_op_threads
+            )
+    except Exception as e:
+        logger.warning(f"Failed to create {backend} backend ({e}), using pipeline")
+
+    return PipelineBackend(model_name, threshold)
+
+
+def warm_up(detector: DetectorBackend):
+    """Run the detector on a dummy frame.
+
+    The first inference pays for lazy initialization such as thread pool
+    creation and memory allocation, which should not delay the first real frame.
+    """
+    start_time = time.time()
+    detector(Image.new("RGB", WARM_UP_IMAGE_SIZE))
+    logger.info(f"Warm-up inference took {time.time() - start_time:.3f} s")
+
+
+def create_bytes_detector(*args, **kwargs) -> Callable[[bytes], List[Dict]]:
+    """Create a warmed-up object detector that takes encoded image bytes.
+
+    Accepts the same arguments as `create_detector`. Wrapped in
+    `functools.partial`, this can be used as the handler factory of a
+    `core.local_worker.LocalWorker`.
+    """
+    detector = create_detector(*args, **kwargs)
+    warm_up(detector)
+
+    def detect(image_data) -> List[Dict]:
+        return detector(Image.open(io.BytesIO(image_data)))
+
+    return detect
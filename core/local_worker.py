@@ -0,0 +1,297 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from itertools import count
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUM_SLOTS = 4
+DEFAULT_SLOT_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_RESTARTS = 3
+DEFAULT_STALL_TIMEOUT = 30.0
+
+# req_id of the message a worker sends once its handler is created
+READY = -1
+
+
+def configure_local_worker_logging(verbose=False):
+    """Configure logging level based on verbosity.
+
+    Args:
+        verbose: If True, set logging level to INFO, otherwise to WARNING
+    """
+    if verbose:
+        logger.setLevel(logging.INFO)
+    else:
+        logger.setLevel(logging.WARNING)
+
+
+configure_local_worker_logging(False)
+
+
+def worker_main(
+    handler_factory: Callable[[], Callable[[memoryview], Any]],
+    shm_name: str,
+    slot_size: int,
+    request_queue: multiprocessing.Queue,
+    result_queue: multiprocessing.Queue,
+):
+    """Entry point of the worker process.
+
+    Args:
+        handler_factory: Creates the handler that processes the frames
+        shm_name: Name of the shared memory block holding the ring slots
+        slot_size: Size of a ring slot in bytes
+        request_queue: Receives (req_id, slot, length) tuples, or None to stop
+        result_queue: Sends back (req_id, success, result or error) tuples
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    handler = handler_factory()
+    result_queue.put((READY, True, None))
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            break
+
+        req_id, slot, length = request
+        view = shm.buf[slot * slot_size : slot * slot_size + length]
+        try:
+            result_queue.put((req_id, True, handler(view)))
+        except Exception as e:
+            result_queue.put((req_id, False, repr(e)))
+        finally:
+            view.release()
+
+    shm.close()
+
+
+class LocalWorker:
+    """Runs a handler in a dedicated process to keep it off the caller's GIL.
+
+    Inputs are copied into the slots of a shared memory ring buffer, so that only
+    the slot index and length are sent to the worker, and only the (small)
+    results are pickled on the way back. When all slots are in use, `submit`
+    blocks until a slot is freed, or until its timeout expires.
+
+    If the worker process dies, or hangs with a request in flight for more than
+    `stall_timeout` seconds, the requests in flight fail with a RuntimeError
+    and the worker is restarted. After `max_restarts` consecutive crashes without
+    a successful request in between, the worker is given up on and every further
+    request fails.
+    """
+
+    def __init__(
+        self,
+        handler_factory: Callable[[], Callable[[memoryview], Any]],
+        num_slots: int = DEFAULT_NUM_SLOTS,
+        slot_size: int = DEFAULT_SLOT_SIZE,
+        max_restarts: int = DEFAULT_MAX_RESTARTS,
+        stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+    ):
+        """
+        Args:
+            handler_factory: Picklable callable that creates the handler inside the
+                worker process. The handler receives a memoryview of the input,
+                which is only valid for the duration of the call.
+            num_slots: Number of ring slots, i.e. maximum number of requests in
+                flight
+            slot_size: Maximum size of an input in bytes
+            max_restarts: Maximum number of consecutive restarts after crashes
+            stall_timeout: Seconds a request may stay in flight once the worker
+                is ready, after which the worker is considered hung and restarted
+        """
+        self.handler_factory = handler_factory
+        self.num_slots = num_slots
+        self.slot_size = slot_size
+        self.max_restarts = max_restarts
+        self.stall_timeout = stall_timeout
+
+        # spawn rather than fork: forking after gRPC and torch threads start is unsafe
+        self.ctx = multiprocessing.get_context("spawn")
+        self.shm = shared_memory.SharedMemory(create=True, size=num_slots * slot_size)
+        self.free_slots = queue.Queue()
+        for slot in range(num_slots):
+            self.free_slots.put(slot)
+
+        self.lock = threading.Lock()
+        # req_id -> (slot, future, submit time)
+        self.pending: Dict[int, Tuple[int, Future, float]] = {}
+        self.req_ids = count()
+        self.ready = threading.Event()
+        self.ready_time = 0.0
+        self.restarts = 0
+        self.consecutive_crashes = 0
+        self.failed = False
+        self.closed = False
+
+        self.process: Optional[multiprocessing.Process] = None
+        self.start_process()
+        self.monitor_thread = threading.Thread(target=self.monitor, daemon=True)
+        self.monitor_thread.start()
+
+    def start_process(self):
+        """Start a new worker process with fresh queues."""
+        self.request_queue = self.ctx.Queue()
+        self.result_queue = self.ctx.Queue()
+        self.process = self.ctx.Process(
+            target=worker_main,
+            args=(
+                self.handler_factory,
+                self.shm.name,
+                self.slot_size,
+                self.request_queue,
+                self.result_queue,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    def is_stalled(self) -> bool:
+        """Whether a request has been in flight for more than the stall timeout.
+
+        Time spent waiting for the worker to become ready does not count.
+        """
+        if not self.ready.is_set():
+            return False
+        with self.lock:
+            oldest = min(
+                (submit_time for _, _, submit_time in self.pending.values()),
+                default=None,
+            )
+        if oldest is None:
+            return False
+        return time.time() - max(oldest, self.ready_time) > self.stall_timeout
+
+    def monitor(self):
+        """Receive results from the worker and restart it when it crashes."""
+        while not self.closed:
+            if self.is_stalled():
+                logger.warning(
+                    f"Local worker stalled for more than {self.stall_timeout} s, "
+                    "killing it"
+                )
+                self.process.terminate()
+                self.process.join()
+                self.handle_crash()
+                continue
+
+            try:
+                req_id, success, result = self.result_queue.get(timeout=0.1)
+            except queue.Empty:
+                if not self.process.is_alive() and not self.closed:
+                    self.handle_crash()
+                continue
+
+            if req_id == READY:
+                logger.info("Local worker is ready")
+                self.ready_time = time.time()
+                self.ready.set()
+                continue
+
+            with self.lock:
+                slot, future, _ = self.pending.pop(req_id)
+            self.free_slots.put(slot)
+            self.consecutive_crashes = 0
+            if success:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(f"Local worker failed: {result}"))
+
+    def handle_crash(self):
+        """Fail the requests in flight and restart the worker process."""
+        logger.warning(f"Local worker crashed with exit code {self.process.exitcode}")
+        with self.lock:
+            for slot, future, _ in self.pending.values():
+                self.free_slots.put(slot)
+                future.set_exception(RuntimeError("Local worker crashed"))
+            self.pending.clear()
+
+            self.ready.clear()
+            self.consecutive_crashes += 1
+            if self.consecutive_crashes > self.max_restarts:
+                logger.warning("Local worker keeps crashing, giving up")
+                self.failed = True
+                self.closed = True
+                return
+
+            self.restarts += 1
+            self.start_process()
+
+    def wait_until_ready(self) -> bool:
+        """Block until the worker has created its handler.
+
+        Returns:
+            True once the worker is ready, False if it failed to start
+        """
+        while not self.ready.wait(timeout=0.1):
+            if self.failed:
+                return False
+        return True
+
+    def submit(self, data: bytes, timeout: Optional[float] = None) -> Future:
+        """Send an input to the worker.
+
+        Args:
+            data: The input, at most `slot_size` bytes long
+            timeout: Maximum time in seconds to wait for a free slot, or None to
+                wait indefinitely
+
+        Returns:
+            Future holding the result of the handler
+
+        Raises:
+            TimeoutError: If no slot was freed within the timeout
+        """
+        if len(data) > self.slot_size:
+            raise ValueError(
+                f"Input of {len(data)} bytes exceeds slot size of {self.slot_size}"
+            )
+        if self.failed or self.closed:
+            raise RuntimeError("Local worker is not running")
+
+        try:
+            slot = self.free_slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free slot within {timeout} s") from None
+        offset = slot * self.slot_size
+        self.shm.buf[offset : offset + len(data)] = data
+
+        future = Future()
+        with self.lock:
+            req_id = next(self.req_ids)
+            self.pending[req_id] = (slot, future, time.time())
+            self.request_queue.put((req_id, slot, len(data)))
+        return future
+
+    def __call__(self, data: bytes, timeout: Optional[float] = None) -> Any:
+        """Process an input in the worker and wait for the result.
+
+        Args:
+            data: The input, at most `slot_size` bytes long
+            timeout: Maximum time in seconds to wait for a free slot and the
+                result together, or None to wait indefinitely
+        """
+        if timeout is None:
+            return self.submit(data).result()
+        deadline = time.time() + timeout
+        future = self.submit(data, timeout)
+        return future.result(max(0.0, deadline - time.time()))
+
+    def close(self):
+        """Stop the worker process and release the shared memory."""
+        # stop monitoring first, so that the exiting worker is not restarted
+        self.closed = True
+        self.monitor_thread.join()
+        if self.process.is_alive():
+            self.request_queue.put(None)
+            self.process.join(timeout=5.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.shm.close()
+        self.shm.unlink()
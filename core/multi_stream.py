@@ -0,0 +1,298 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from statistics import median
+from typing import Any, Deque, Dict, Hashable, List, Optional
+
+from core.cloud_executor import Deadline, InputT, Timestamp
+from core.coordinator import SpeculativeOperator
+
+# Setup logger - will be configured based on verbosity
+multi_stream_logger = logging.getLogger(__name__)
+
+SCHEDULING_POLICIES = ["deadline", "fair"]
+
+
+def configure_multi_stream_logging(verbose=False):
+    """Configure logging level based on verbosity.
+
+    Args:
+        verbose: If True, set logging level to INFO, otherwise to WARNING
+    """
+    if verbose:
+        multi_stream_logger.setLevel(logging.INFO)
+    else:
+        multi_stream_logger.setLevel(logging.WARNING)
+
+
+# Default to non-verbose
+configure_multi_stream_logging(False)
+
+
+@dataclass
+class Frame:
+    """A message waiting to be processed."""
+
+    timestamp: Timestamp
+    input_message: InputT
+    deadline: Deadline
+    submit_time: float
+    future: Future
+
+
+@dataclass
+class Stream:
+    """Scheduling state and statistics of a stream."""
+
+    stream_id: Hashable
+    weight: float
+    max_in_flight: int
+    max_pending: int
+    pending: Deque[Frame] = field(default_factory=deque)
+    in_flight: int = 0
+    virtual_time: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    processed: int = 0
+    misses: int = 0
+    dropped: int = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Summarize the latency and deadline misses of the stream."""
+        total = self.processed + self.misses + self.dropped
+        ordered = sorted(self.latencies)
+        return {
+            "processed": self.processed,
+            "misses": self.misses,
+            "dropped": self.dropped,
+            "miss_rate": (self.misses + self.dropped) / total if total else 0.0,
+            "median_latency": median(ordered) if ordered else None,
+            "p95_latency": (
+                ordered[int(0.95 * (len(ordered) - 1))] if ordered else None
+            ),
+        }
+
+
+class MultiStreamOperator:
+    """Processes the frames of several streams with one shared operator.
+
+    All streams share the operator's cloud implementations (and thus their
+    channels) and a fixed pool of workers. Whenever a worker is free, the next
+    frame is picked among the streams below their in-flight limit, either by
+    earliest deadline (`"deadline"`) or by weighted fair queuing (`"fair"`),
+    where each stream receives a share of the workers proportional to its
+    weight. Streams whose pending queue is full drop their oldest frame, since
+    stale camera frames are not worth processing.
+    """
+
+    def __init__(
+        self,
+        operator: SpeculativeOperator,
+        max_workers: int = 4,
+        scheduling: str = "deadline",
+    ):
+        """
+        Args:
+            operator: Operator shared by all streams
+            max_workers: Number of frames processed concurrently across streams
+            scheduling: One of `SCHEDULING_POLICIES`
+        """
+        if scheduling not in SCHEDULING_POLICIES:
+            raise ValueError(
+                f"Unknown scheduling {scheduling}, "
+                f"expected one of {SCHEDULING_POLICIES}"
+            )
+
+        self.operator = operator
+        self.max_workers = max_workers
+        self.scheduling = scheduling
+        self.streams: Dict[Hashable, Stream] = {}
+        self.free_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def add_stream(
+        self,
+        stream_id: Hashable,
+        weight: float = 1.0,
+        max_in_flight: int = 1,
+        max_pending: int = 2,
+    ):
+        """Register a stream.
+
+        Args:
+            stream_id: Identifier of the stream, e.g. the camera name
+            weight: Share of the workers under fair scheduling
+            max_in_flight: Maximum number of frames of the stream processed
+                concurrently
+            max_pending: Maximum number of frames of the stream waiting to be
+                processed
+        """
+        with self.condition:
+            self.streams[stream_id] = Stream(
+                stream_id=stream_id,
+                weight=weight,
+                max_in_flight=max_in_flight,
+                max_pending=max_pending,
+            )
+
+    def submit(
+        self,
+        stream_id: Hashable,
+        timestamp: Timestamp,
+        input_message: InputT,
+        deadline: Deadline,
+    ) -> Future:
+        """Queue a frame of a stream for processing.
+
+        Args:
+            stream_id: Identifier of a registered stream
+            timestamp: Timestamp or identifier for the frame
+            input_message: The frame
+            deadline: Deadline of the frame. Relative deadlines are measured
+                from the time of submission.
+
+        Returns:
+            Future holding the result of `SpeculativeOperator.process_message`
+        """
+        now = time.time()
+        frame = Frame(
+            timestamp=timestamp,
+            input_message=input_message,
+            deadline=deadline.to_absolute(now),
+            submit_time=now,
+            future=Future(),
+        )
+
+        with self.condition:
+            stream = self.streams[stream_id]
+            if not stream.pending and stream.in_flight == 0:
+                # an idle stream must not catch up on the share it did not use
+                stream.virtual_time = max(
+                    stream.virtual_time, self.min_virtual_time()
+                )
+            stream.pending.append(frame)
+            if len(stream.pending) > stream.max_pending:
+                stale = stream.pending.popleft()
+                stream.dropped += 1
+                stale.future.set_exception(
+                    Exception(
+                        f"Frame {stale.timestamp} of stream {stream_id} dropped!"
+                    )
+                )
+            self.condition.notify()
+
+        return frame.future
+
+    def min_virtual_time(self) -> float:
+        """Virtual time of the least served stream with pending work."""
+        active = [
+            stream.virtual_time
+            for stream in self.streams.values()
+            if stream.pending or stream.in_flight
+        ]
+        return min(active, default=0.0)
+
+    def next_stream(self) -> Optional[Stream]:
+        """Pick the stream whose frame is processed next, if any is eligible."""
+        eligible = [
+            stream
+            for stream in self.streams.values()
+            if stream.pending and stream.in_flight < stream.max_in_flight
+        ]
+        if not eligible:
+            return None
+        if self.scheduling == "deadline":
+            return min(
+                eligible, key=lambda stream: stream.pending[0].deadline.seconds
+            )
+        return min(
+            eligible, key=lambda stream: stream.virtual_time + 1.0 / stream.weight
+        )
+
+    def dispatch(self):
+        """Hand frames to free workers in scheduling order."""
+        while True:
+            with self.condition:
+                stream = None
+                while not self.closed:
+                    if self.free_workers > 0:
+                        stream = self.next_stream()
+                        if stream is not None:
+                            break
+                    self.condition.wait()
+                if self.closed:
+                    return
+
+                frame = stream.pending.popleft()
+                if time.time() > frame.deadline.seconds:
+                    stream.misses += 1
+                    frame.future.set_exception(
+                        Exception(
+                            f"Frame {frame.timestamp} of stream {stream.stream_id} "
+                            "expired before being scheduled!"
+                        )
+                    )
+                    continue
+
+                stream.in_flight += 1
+                stream.virtual_time += 1.0 / stream.weight
+                self.free_workers -= 1
+
+            self.executor.submit(self.process_frame, stream, frame)
+
+    def process_frame(self, stream: Stream, frame: Frame):
+        """Process a frame with the shared operator and record its outcome."""
+        try:
+            result = self.operator.process_message(
+                frame.timestamp, frame.input_message, deadline=frame.deadline
+            )
+        except Exception as e:
+            result = None
+            error = e
+        else:
+            error = None
+        end_time = time.time()
+
+        with self.condition:
+            stream.in_flight -= 1
+            self.free_workers += 1
+            if error is not None or end_time > frame.deadline.seconds:
+                stream.misses += 1
+            else:
+                stream.processed += 1
+                stream.latencies.append(end_time - frame.submit_time)
+            self.condition.notify()
+
+        multi_stream_logger.info(
+            f"Stream {stream.stream_id} frame {frame.timestamp} took "
+            f"{end_time - frame.submit_time:.3f} s"
+        )
+        if error is not None:
+            frame.future.set_exception(error)
+        else:
+            frame.future.set_result(result)
+
+    def stats(self) -> Dict[Hashable, Dict[str, Any]]:
+        """Per-stream latency and deadline miss statistics."""
+        with self.condition:
+            return {
+                stream_id: stream.stats()
+                for stream_id, stream in self.streams.items()
+            }
+
+    def close(self):
+        """Stop scheduling, cancel pending frames and wait for the frames in flight."""
+        with self.condition:
+            self.closed = True
+            for stream in self.streams.values():
+                while stream.pending:
+                    stream.pending.popleft().future.cancel()
+            self.condition.notify()
+        self.dispatcher.join()
+        self.executor.shutdown(wait=True)
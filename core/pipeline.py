@@ -0,0 +1,171 @@
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, List, Optional, Self, Tuple
+
+from core.cloud_executor import Deadline, Timestamp
+from core.coordinator import SpeculativeOperator
+
+# Setup logger - will be configured based on verbosity
+pipeline_logger = logging.getLogger(__name__)
+
+# Priority under which SpeculativeOperator reports results of local execution
+LOCAL_PRIORITY = -1
+
+
+def configure_pipeline_logging(verbose=False):
+    """Configure logging level based on verbosity.
+
+    Args:
+        verbose: If True, set logging level to INFO, otherwise to WARNING
+    """
+    if verbose:
+        pipeline_logger.setLevel(logging.INFO)
+    else:
+        pipeline_logger.setLevel(logging.WARNING)
+
+
+# Default to non-verbose
+configure_pipeline_logging(False)
+
+
+def result_to_output(operator: SpeculativeOperator, result: Tuple) -> Any:
+    """Convert a result returned by `SpeculativeOperator.process_message`.
+
+    Local results are already of the operator's output type. Cloud results carry
+    the raw RPC response, which is converted by the `response_handler` of the
+    implementation that produced it.
+
+    Args:
+        operator: The operator that produced the result
+        result: (priority, completion time, value) tuple
+
+    Returns:
+        The output of the operator
+    """
+    priority, _, value = result
+    if priority == LOCAL_PRIORITY:
+        return value
+
+    for imp in operator.implementations:
+        if imp.priority == priority:
+            return imp.response_handler(value)
+
+    raise ValueError(f"No implementation registered with priority {priority}")
+
+
+@dataclass
+class Stage:
+    """A named operator in a pipeline with its observed latencies."""
+
+    name: str
+    operator: SpeculativeOperator
+    latencies: Deque[float] = field(default_factory=deque)
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        """Return the q-quantile of observed latencies, or None without history."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class SpeculativePipeline:
+    """Chains speculative operators under a single end-to-end deadline.
+
+    The output of each stage is the input of the next. Before a stage runs, the
+    remaining budget is split across the remaining stages in proportion to their
+    observed latency quantiles, and the stage receives its share as an absolute
+    deadline. Slack left over by a fast stage therefore flows to the downstream
+    stages. Until every remaining stage has latency history, the budget is split
+    evenly.
+
+    Each stage forwards the first result that becomes available (typically the
+    local one), so downstream stages start without waiting for slower cloud
+    refinements of upstream results.
+    """
+
+    def __init__(self, quantile: float = 0.95, history_size: int = 100):
+        """
+        Args:
+            quantile: Latency quantile used to split the budget across stages
+            history_size: Number of recent latencies kept per stage
+        """
+        self.stages: List[Stage] = []
+        self.quantile = quantile
+        self.history_size = history_size
+
+    def add_stage(self, name: str, operator: SpeculativeOperator) -> Self:
+        """Append an operator to the end of the pipeline.
+
+        Args:
+            name: Name of the stage, used in logs and errors
+            operator: Operator run by the stage
+
+        Returns:
+            The pipeline, so that calls can be chained
+        """
+        latencies = deque(maxlen=self.history_size)
+        self.stages.append(Stage(name=name, operator=operator, latencies=latencies))
+        return self
+
+    def stage_deadline(self, index: int, now: float, end_time: float) -> Deadline:
+        """Compute the absolute deadline of a stage.
+
+        Args:
+            index: Index of the stage about to run
+            now: Current time
+            end_time: Absolute end-to-end deadline of the pipeline
+
+        Returns:
+            Absolute deadline for the stage
+        """
+        remaining = end_time - now
+        estimates = [
+            stage.latency_quantile(self.quantile) for stage in self.stages[index:]
+        ]
+        if any(estimate is None for estimate in estimates) or sum(estimates) <= 0:
+            share = 1.0 / len(estimates)
+        else:
+            share = estimates[0] / sum(estimates)
+        return Deadline.absolute(now + remaining * share)
+
+    def process_message(
+        self, timestamp: Timestamp, input_message: Any, deadline: Deadline
+    ) -> Any:
+        """Run a message through every stage of the pipeline.
+
+        Args:
+            timestamp: Timestamp or identifier for the message, passed to each stage
+            input_message: Input of the first stage
+            deadline: End-to-end deadline. Relative deadlines are measured from
+                the time of this call.
+
+        Returns:
+            The output of the last stage
+        """
+        end_time = deadline.to_absolute(time.time()).seconds
+        message = input_message
+
+        for index, stage in enumerate(self.stages):
+            now = time.time()
+            if now >= end_time:
+                raise Exception(
+                    f"End-to-end deadline expired before stage '{stage.name}'!"
+                )
+
+            stage_deadline = self.stage_deadline(index, now, end_time)
+            pipeline_logger.info(
+                f"Stage '{stage.name}' has budget {stage_deadline.seconds - now:.3f} s"
+            )
+            try:
+                result = stage.operator.process_message(
+                    timestamp, message, deadline=stage_deadline
+                )
+            finally:
+                # a missed deadline still bounds the stage latency from below
+                stage.latencies.append(time.time() - now)
+            message = result_to_output(stage.operator, result)
+
+        return message
@@ -0,0 +1,158 @@
+import argparse
+import logging
+import os
+import time
+import warnings
+from statistics import median
+
+# Suppress PyTorch warnings
+os.environ["PYTHONWARNINGS"] = "ignore::UserWarning"
+warnings.filterwarnings("ignore", category=UserWarning)
+
+from core.detectors import BACKENDS, DEFAULT_MODEL, create_detector
+from PIL import Image
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+IOU_THRESHOLD = 0.5
+
+
+def load_images(image_dir):
+    """Load the images of a directory in a fixed (sorted) order.
+
+    Args:
+        image_dir: Directory containing the images
+
+    Returns:
+        List of RGB images
+    """
+    paths = sorted(
+        os.path.join(image_dir, name)
+        for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [Image.open(path).convert("RGB") for path in paths]
+
+
+def iou(box_a, box_b):
+    """Intersection over union of two boxes in pipeline format."""
+    width = min(box_a["xmax"], box_b["xmax"]) - max(box_a["xmin"], box_b["xmin"])
+    height = min(box_a["ymax"], box_b["ymax"]) - max(box_a["ymin"], box_b["ymin"])
+    intersection = max(0, width) * max(0, height)
+    area_a = (box_a["xmax"] - box_a["xmin"]) * (box_a["ymax"] - box_a["ymin"])
+    area_b = (box_b["xmax"] - box_b["xmin"]) * (box_b["ymax"] - box_b["ymin"])
+    union = area_a + area_b - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def count_matches(detections, reference):
+    """Greedily match detections to reference detections with the same label.
+
+    Args:
+        detections: Detections of the evaluated backend
+        reference: Detections of the reference backend
+
+    Returns:
+        Number of detections matching a distinct reference detection
+    """
+    unmatched = list(reference)
+    matches = 0
+    for obj in sorted(detections, key=lambda obj: -obj["score"]):
+        candidates = [
+            ref
+            for ref in unmatched
+            if ref["label"] == obj["label"]
+            and iou(ref["box"], obj["box"]) >= IOU_THRESHOLD
+        ]
+        if candidates:
+            best = max(candidates, key=lambda ref: iou(ref["box"], obj["box"]))
+            unmatched.remove(best)
+            matches += 1
+    return matches
+
+
+def run_backend(detector, images):
+    """Run a detector on every image, after one warm-up inference.
+
+    Returns:
+        Tuple of (detections per image, latency per image)
+    """
+    detector(images[0])
+    detections = []
+    latencies = []
+    for image in images:
+        start_time = time.time()
+        detections.append(detector(image))
+        latencies.append(time.time() - start_time)
+    return detections, latencies
+
+
+def benchmark(image_dir, backends, model_name, threads):
+    """Compare the latency and accuracy of detector backends.
+
+    Accuracy is measured against the fp32 pipeline backend: precision is the
+    fraction of detections matching a reference detection (same label and
+    IoU >= 0.5), recall the fraction of reference detections that are found.
+
+    Args:
+        image_dir: Directory containing the fixed image set
+        backends: Backends to compare
+        model_name: Object detection model to use
+        threads: Number of intra-op threads used for inference
+    """
+    images = load_images(image_dir)
+    if not images:
+        raise ValueError(f"No images found in {image_dir}")
+    logger.info(f"Benchmarking {backends} on {len(images)} images")
+
+    # the fp32 pipeline runs first and serves as the accuracy reference
+    backends = ["pipeline"] + [b for b in backends if b != "pipeline"]
+    reference = None
+
+    for backend in backends:
+        detector = create_detector(backend, model_name, intra_op_threads=threads)
+        if detector.name != backend:
+            logger.warning(f"Skipping {backend}: backend unavailable")
+            continue
+        detections, latencies = run_backend(detector, images)
+        if backend == "pipeline":
+            reference = detections
+
+        matches = sum(map(count_matches, detections, reference))
+        num_detections = sum(map(len, detections))
+        num_reference = sum(map(len, reference))
+        precision = matches / num_detections if num_detections else 1.0
+        recall = matches / num_reference if num_reference else 1.0
+        p95_latency = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+        logger.info(
+            f"{backend:>10}: median {median(latencies):.3f}s, p95 {p95_latency:.3f}s, "
+            f"precision {precision:.3f}, recall {recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare latency and accuracy of object detector backends"
+    )
+    parser.add_argument(
+        "--images", type=str, required=True, help="Directory of benchmark images"
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=BACKENDS,
+        default=BACKENDS,
+        help="Backends to compare against the fp32 pipeline",
+    )
+    parser.add_argument(
+        "--model", type=str, default=DEFAULT_MODEL, help="Object detection model"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=None, help="Intra-op threads for inference"
+    )
+    args = parser.parse_args()
+
+    benchmark(args.images, args.backends, args.model, args.threads)
@@ -0,0 +1,171 @@
+import argparse
+import json
+import logging
+import os
+import time
+import warnings
+
+# Suppress PyTorch warnings
+os.environ["PYTHONWARNINGS"] = "ignore::UserWarning"
+warnings.filterwarnings("ignore", category=UserWarning)
+
+import cv2
+from core.cloud_executor import configure_logging
+from core.coordinator import configure_coordinator_logging
+from core.detectors import BACKENDS
+from examples.example_sync import (
+    STARTUP_TIMEOUT,
+    ImageRpcHandle,
+    ObjectDetectionOperator,
+    msg_handler,
+    response_handler,
+)
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def read_frames(video_path):
+    """Yield (frame id, PNG-encoded frame) tuples of a video."""
+    cap = cv2.VideoCapture(video_path)
+    frame_id = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame_id, cv2.imencode(".png", frame)[1].tobytes()
+        frame_id += 1
+    cap.release()
+
+
+def to_compact(detected_objects):
+    """Convert detections to [label, score, xmin, ymin, xmax, ymax] lists.
+
+    Accepts both local results (pipeline dicts) and cloud results
+    (`DetectedObject` messages).
+    """
+    compact = []
+    for obj in detected_objects:
+        if isinstance(obj, dict):
+            label, score, box = obj["label"], obj["score"], obj["box"]
+            coords = (box["xmin"], box["ymin"], box["xmax"], box["ymax"])
+        else:
+            label, score, box = obj.label, obj.score, obj.box
+            coords = (box.xmin, box.ymin, box.xmax, box.ymax)
+        compact.append([label, round(score, 3)] + [round(c, 1) for c in coords])
+    return compact
+
+
+def process_offline(
+    video_path,
+    server_ports,
+    output_path,
+    batch_size=16,
+    batches_in_flight=2,
+    use_local=False,
+    backend="pipeline",
+):
+    """Process a recorded video as fast as possible and write the detections.
+
+    Each line of the output file is a JSON list of the detections of a frame, in
+    frame order.
+
+    Args:
+        video_path: Path to the video file to process
+        server_ports: List of ports where object detection servers are running
+        output_path: Path of the output file
+        batch_size: Number of frames per batch RPC
+        batches_in_flight: Maximum number of batches in flight per server
+        use_local: If True, use local execution as spare capacity
+        backend: Detector backend used for local execution
+    """
+    operator = ObjectDetectionOperator(backend=backend, enable_local=use_local)
+    for i, port in enumerate(server_ports):
+        operator.use_cloud(
+            ImageRpcHandle(port=port), msg_handler, response_handler, priority=i
+        )
+
+    if not operator.wait_until_ready(STARTUP_TIMEOUT):
+        logger.error(f"No server was ready after {STARTUP_TIMEOUT} s")
+        operator.close()
+        return
+
+    logger.info(f"Processing video offline: {video_path}")
+    start_time = time.time()
+    frame_count = 0
+    with open(output_path, "w") as output_file:
+        for detected_objects in operator.process_iter(
+            read_frames(video_path),
+            batch_size=batch_size,
+            batches_in_flight=batches_in_flight,
+            use_local=use_local,
+        ):
+            output_file.write(json.dumps(to_compact(detected_objects)) + "\n")
+            frame_count += 1
+    operator.close()
+
+    total_time = time.time() - start_time
+    logger.info(
+        f"Processed {frame_count} frames in {total_time:.3f}s "
+        f"({frame_count / total_time:.2f} frames/s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline batch object detection of a recorded video"
+    )
+    parser.add_argument(
+        "--video", type=str, required=True, help="Path to the input video file"
+    )
+    parser.add_argument(
+        "--ports",
+        nargs="+",
+        type=int,
+        required=True,
+        help="List of server ports where object detection servers are running",
+    )
+    parser.add_argument(
+        "--output", type=str, required=True, help="Path of the output file"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=16, help="Number of frames per batch"
+    )
+    parser.add_argument(
+        "--batches-in-flight",
+        type=int,
+        default=2,
+        help="Maximum number of batches in flight per server",
+    )
+    parser.add_argument(
+        "--use-local",
+        action="store_true",
+        help="Use local execution as spare capacity when all servers are busy",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=BACKENDS,
+        default="pipeline",
+        help="Detector backend used for local execution",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Enable verbose logging of internal operations",
+    )
+    args = parser.parse_args()
+
+    configure_logging(args.verbose)
+    configure_coordinator_logging(args.verbose)
+
+    process_offline(
+        video_path=args.video,
+        server_ports=args.ports,
+        output_path=args.output,
+        batch_size=args.batch_size,
+        batches_in_flight=args.batches_in_flight,
+        use_local=args.use_local,
+        backend=args.backend,
+    )
@@ -3,6 +3,7 @@
 # Please use example_sync.py for working examples of speculative cloud execution.
 # TODO: Implement proper streaming API integration with cloud_executor and coordinator
 
+import argparse
 import io
 import logging
 import os
@@ -11,9 +12,12 @@ import time
 from collections.abc import Iterator
 from typing import Union
 
+import grpc
+import numpy as np
 import requests
 from core import coordinator
 from core.coordinator import Deadline
+from core.delta import DeltaEncoder
 from PIL import Image
 from protos import object_detection_pb2, object_detection_pb2_grpc
 
@@ -93,7 +97,67 @@ class StreamingImageRpcHandle(
         return response
 
 
-def test_speculative_operator():
+class DeltaStreamingImageRpcHandle(StreamingImageRpcHandle):
+    """Streams frames as keyframes and as deltas to the previous frame.
+
+    Frames must be RGB numpy arrays. Use `message_handler` as the message handler
+    of the implementation, so that frames are encoded against the state of this
+    handle's stream.
+    """
+
+    def __init__(self, *args, stream_id=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stream_id = stream_id
+        self.encoder = DeltaEncoder()
+
+    def message_handler(
+        self, timestamp, input_message: np.ndarray
+    ) -> tuple[object_detection_pb2.Request, Deadline]:
+        encoded = self.encoder.encode(input_message)
+        request = object_detection_pb2.Request(
+            image_data=encoded.image_data,
+            req_id=timestamp,
+            stream_id=self.stream_id,
+            frame_seq=encoded.seq,
+            keyframe=encoded.keyframe,
+        )
+        if not encoded.keyframe:
+            request.delta.CopyFrom(
+                object_detection_pb2.FrameDelta(
+                    base_seq=encoded.base_seq,
+                    block_size=encoded.block_size,
+                    block_mask=encoded.block_mask,
+                    block_data=encoded.block_data,
+                )
+            )
+        return request, Deadline(seconds=1.5, is_absolute=False)
+
+    def reset_stream(self):
+        """Open a new stream. The server state is lost, so resync with a keyframe."""
+        self.request_iterator = StreamingIterator()
+        self.response_iterator = self.stub().ProcessImageStreaming(
+            self.request_iterator
+        )
+        self.encoder.reset()
+
+    def __call__(self, rpc_request):
+        try:
+            response = super().__call__(rpc_request)
+        except grpc.RpcError:
+            self.reset_stream()
+            raise
+        if response.resync_required:
+            # the detections of a frame the server could not reconstruct are
+            # meaningless, so leave the frame to the other implementations
+            self.encoder.reset()
+            raise Exception(
+                f"Stream {self.stream_id} lost sync at request {response.req_id}, "
+                "resending a keyframe"
+            )
+        return response
+
+
+def test_speculative_operator(delta=False):
     operator = MyOperator()
     # rpc_handle = StreamingImageRpcHandle()
     images = [  # 'https://i.imgur.com/2lnWoly.jpg',
@@ -104,11 +168,18 @@ def test_speculative_operator():
     ]
 
     # Register cloud implementations.
+    rpc_handles = []
     for i in range(3):  # must be equal to max_workers
-        rpc_handle = StreamingImageRpcHandle()
+        if delta:
+            rpc_handle = DeltaStreamingImageRpcHandle(stream_id=i)
+            handler = rpc_handle.message_handler
+        else:
+            rpc_handle = StreamingImageRpcHandle()
+            handler = msg_handler
+        rpc_handles.append(rpc_handle)
         operator.use_cloud(
             rpc_handle,
-            msg_handler,
+            handler,
             response_handler,
             priority=i,
         )
@@ -122,7 +193,7 @@ def test_speculative_operator():
         # logger.info(type(img_byte_arr), len(img_byte_arr))
 
         timestamp = i
-        message = img_byte_arr
+        message = np.asarray(img.convert("RGB")) if delta else img_byte_arr
         result = operator.process_message(timestamp, message)
         if not result:
             logger.info("result empty")
@@ -131,6 +202,9 @@ def test_speculative_operator():
 
     elapsed_time = time.time() - start_time
     logger.info(f"streaming took {elapsed_time} seconds to process all images")
+    if delta:
+        for rpc_handle in rpc_handles:
+            logger.info(f"stream {rpc_handle.stream_id}: {rpc_handle.encoder.stats()}")
 
 
 def msg_handler(timestamp, input_message) -> tuple[RpcRequest, Deadline]:
@@ -144,4 +218,11 @@ def response_handler(input: object_detection_pb2.Response):
 
 
 if __name__ == "__main__":
-    test_speculative_operator()
+    parser = argparse.ArgumentParser(description="Streaming API example (WIP)")
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Send keyframes and inter-frame deltas instead of full images",
+    )
+    args = parser.parse_args()
+    test_speculative_operator(delta=args.delta)
@@ -1,7 +1,9 @@
 import argparse
+import functools
 import io
 import logging
 import os
+import threading
 import time
 import warnings
 from statistics import median
@@ -11,37 +13,108 @@ os.environ["PYTHONWARNINGS"] = "ignore::UserWarning"
 warnings.filterwarnings("ignore", category=UserWarning)
 
 import cv2
+import grpc
 from core import cloud_executor, coordinator
 from core.cloud_executor import Deadline, configure_logging
 from core.coordinator import configure_coordinator_logging
+from core.detectors import (
+    BACKENDS,
+    DEFAULT_MODEL,
+    create_bytes_detector,
+    create_detector,
+    warm_up,
+)
+from core.local_worker import LocalWorker, configure_local_worker_logging
 from PIL import Image
 from protos import object_detection_pb2, object_detection_pb2_grpc
-from transformers import pipeline
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 FRAME_LIMIT = 30
+# a local result arriving later than this is of no use to the coordinator
+LOCAL_TIMEOUT = 5.0
+# loading DETR locally or on a cold server takes a while
+STARTUP_TIMEOUT = 120.0
 
 
 class ObjectDetectionOperator(coordinator.SpeculativeOperator[int, int]):
     """Operator that performs object detection locally and in the cloud,
     then using whichever result arrives first.
+
+    The local model is loaded in the background. Until it is ready, frames are
+    only processed in the cloud.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        backend="pipeline",
+        model_name=DEFAULT_MODEL,
+        threads=None,
+        use_worker_process=True,
+        enable_local=True,
+        local_timeout=LOCAL_TIMEOUT,
+    ):
         super().__init__()
-        self.obj_detector = pipeline(
-            "object-detection", model="facebook/detr-resnet-50"
-        )
+        self.local_timeout = local_timeout
+        self.local_worker = None
+        self.obj_detector = None
+        self.local_ready = threading.Event()
+        self.local_failed = threading.Event()
+        # without local execution, is_local_ready() stays False and frames are
+        # only processed in the cloud
+        if enable_local and use_worker_process:
+            # keeps inference off the GIL of the RPC and coordinator threads
+            self.local_worker = LocalWorker(
+                functools.partial(
+                    create_bytes_detector,
+                    backend,
+                    model_name=model_name,
+                    intra_op_threads=threads,
+                )
+            )
+        elif enable_local:
+            threading.Thread(
+                target=self.load_detector,
+                args=(backend, model_name, threads),
+                daemon=True,
+            ).start()
+
+    def load_detector(self, backend, model_name, threads):
+        """Load and warm up the in-process detector."""
+        try:
+            self.obj_detector = create_detector(
+                backend, model_name=model_name, intra_op_threads=threads
+            )
+            warm_up(self.obj_detector)
+        except Exception:
+            logger.exception("Failed to load the local model, running cloud-only")
+            self.local_failed.set()
+            return
+        self.local_ready.set()
+
+    def is_local_ready(self):
+        """Whether the local model has been loaded and warmed up."""
+        if self.local_worker is not None:
+            return self.local_worker.ready.is_set()
+        return self.local_ready.is_set()
 
     def execute_local(self, input_message):
         """Execute object detection locally on the input image data."""
+        if self.local_worker is not None:
+            # bounded, so that a hung worker does not leak a blocked thread per
+            # frame; the worker restarts itself once it is detected as stalled
+            return self.local_worker(input_message, timeout=self.local_timeout)
         im = Image.open(io.BytesIO(input_message))
         objs = self.obj_detector(im)
         return objs
 
+    def close(self):
+        """Stop the local worker process, if any."""
+        if self.local_worker is not None:
+            self.local_worker.close()
+
 
 class ImageRpcHandle(
     cloud_executor.RpcHandle[
@@ -52,6 +125,15 @@ class ImageRpcHandle(
 ):
     """RPC handle for communicating with the object detection server."""
 
+    def __init__(self, *args, readiness_interval=1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.readiness_interval = readiness_interval
+        self.ready = False
+        # set while the server is (possibly) cold and readiness must be polled
+        self.cold = threading.Event()
+        self.cold.set()
+        threading.Thread(target=self.poll_readiness, daemon=True).start()
+
     def stub(self) -> object_detection_pb2_grpc.GRPCImageStub:
         """Create a gRPC stub for the object detection service."""
         return object_detection_pb2_grpc.GRPCImageStub(self.channel)
@@ -60,7 +142,55 @@ class ImageRpcHandle(
         self, rpc_request: object_detection_pb2.Request
     ) -> object_detection_pb2.Response:
         """Send a synchronous request to the object detection server."""
-        return self.stub().ProcessImageSync(rpc_request)
+        try:
+            return self.stub().ProcessImageSync(rpc_request)
+        except grpc.RpcError as e:
+            self.check_unavailable(e)
+            raise
+
+    def call_batch(
+        self, rpc_requests: list[object_detection_pb2.Request]
+    ) -> list[object_detection_pb2.Response]:
+        """Send a batch of requests to the object detection server."""
+        batch_request = object_detection_pb2.BatchRequest(requests=rpc_requests)
+        try:
+            return list(self.stub().ProcessImageBatch(batch_request).responses)
+        except grpc.RpcError as e:
+            self.check_unavailable(e)
+            raise
+
+    def check_unavailable(self, error: grpc.RpcError):
+        """Stop routing to the server if it is down or restarted cold."""
+        if error.code() == grpc.StatusCode.UNAVAILABLE:
+            self.ready = False
+            self.cold.set()
+
+    def poll_readiness(self):
+        """Poll the server in the background whenever it may be cold."""
+        while True:
+            self.cold.wait()
+            try:
+                response = self.stub().CheckReadiness(
+                    object_detection_pb2.ReadinessRequest(),
+                    timeout=self.readiness_interval,
+                )
+                ready = response.ready
+            except grpc.RpcError:
+                ready = False
+
+            if ready:
+                self.cold.clear()
+                self.ready = True
+            else:
+                time.sleep(self.readiness_interval)
+
+    def is_ready(self) -> bool:
+        """Whether the server has loaded its model.
+
+        Readiness is polled in the background, so this never blocks. A server
+        is considered cold again when a request fails with UNAVAILABLE.
+        """
+        return self.ready
 
 
 def report_performance_statistics(operator, specop_times, total_time, frame_count):
@@ -93,14 +223,22 @@ def report_performance_statistics(operator, specop_times, total_time, frame_coun
     )
 
 
-def process_video(video_path, server_ports):
+def process_video(
+    video_path, server_ports, backend="pipeline", threads=None, in_process=False
+):
     """Process a video using speculative execution with local and cloud detection.
 
     Args:
         video_path: Path to the video file to process
         server_ports: List of ports where object detection servers are running
+        backend: Detector backend used for local execution
+        threads: Number of threads used for local inference
+        in_process: If True, run local inference in this process instead of a
+            dedicated worker process
     """
-    operator = ObjectDetectionOperator()
+    operator = ObjectDetectionOperator(
+        backend=backend, threads=threads, use_worker_process=not in_process
+    )
 
     # Register cloud implementations for each provided server port
     for i, port in enumerate(server_ports):
@@ -112,6 +250,14 @@ def process_video(video_path, server_ports):
             priority=i,
         )
 
+    if not operator.wait_until_ready(STARTUP_TIMEOUT):
+        logger.error(
+            f"Neither the local model nor any server was ready after "
+            f"{STARTUP_TIMEOUT} s"
+        )
+        operator.close()
+        return
+
     logger.info(f"Processing video: {video_path}")
     cap = cv2.VideoCapture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS)
@@ -137,19 +283,25 @@ def process_video(video_path, server_ports):
 
         # Process frame using speculative execution
         specop_start_time = time.time()
-        result = operator.process_message(frame_id, img_byte_arr)
-        specop_elapsed_time = time.time() - specop_start_time
-        specop_times.append(specop_elapsed_time)
-
-        logger.info(
-            f"Frame {frame_id}/{total_frames}: processed in {specop_elapsed_time:.3f}s"
-        )
+        try:
+            result = operator.process_message(frame_id, img_byte_arr)
+        except Exception as e:
+            # e.g. every server went cold while local execution is unavailable
+            logger.warning(f"Frame {frame_id}/{total_frames}: skipped ({e})")
+        else:
+            specop_elapsed_time = time.time() - specop_start_time
+            specop_times.append(specop_elapsed_time)
+            logger.info(
+                f"Frame {frame_id}/{total_frames}: processed in "
+                f"{specop_elapsed_time:.3f}s"
+            )
 
         # Respect original video timing
         time.sleep(1.0 / fps)
         frame_id += 1
 
     cap.release()
+    operator.close()
 
     total_time = time.time() - start_time
     report_performance_statistics(operator, specop_times, total_time, frame_id)
@@ -197,6 +349,24 @@ if __name__ == "__main__":
         required=True,
         help="List of server ports where object detection servers are running",
     )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=BACKENDS,
+        default="pipeline",
+        help="Detector backend used for local execution",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Number of threads used for local inference",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run local inference in this process instead of a worker process",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -206,5 +376,12 @@ if __name__ == "__main__":
 
     configure_logging(args.verbose)
     configure_coordinator_logging(args.verbose)
-
-    process_video(video_path=args.video, server_ports=args.ports)
+    configure_local_worker_logging(args.verbose)
+
+    process_video(
+        video_path=args.video,
+        server_ports=args.ports,
+        backend=args.backend,
+        threads=args.threads,
+        in_process=args.in_process,
+    )
@@ -0,0 +1,409 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from core.detectors import BACKENDS
+from servers.object_detection_server import ImageServer, create_server
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GRACE_PERIOD = 10.0
+STATS_INTERVAL = 10.0
+WARM_UP_TIMEOUT = 300.0
+MAX_RESTARTS = 5
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 60.0
+
+
+def worker_main(
+    worker_id: int,
+    port: str,
+    model_name: str,
+    backend: str,
+    intra_op_threads: int,
+    cpus,
+    events: multiprocessing.Queue,
+    stats_interval: float,
+):
+    """Entry point of a server worker process.
+
+    The worker only starts listening once its model is warmed up, so that the
+    kernel never hands connections to a cold worker. It reports readiness and
+    its number of processed images on `events`, and shuts down gracefully on
+    SIGTERM. It exits with code 1 if its model fails to load.
+    """
+    # Ctrl-C reaches the whole process group, but only the launcher handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+    # one inter-op thread: parallelism comes from the number of workers
+    image_server = ImageServer(model_name, backend, intra_op_threads, 1)
+    while not image_server.ready.wait(timeout=0.1):
+        if image_server.failed.is_set():
+            logger.error(f"Worker {worker_id} failed to load its model")
+            sys.exit(1)
+        if stop.is_set():
+            return
+
+    server = create_server(port, image_server, reuse_port=True)
+    server.start()
+    events.put(("ready", worker_id, os.getpid(), time.time(), 0))
+
+    while not stop.wait(timeout=stats_interval):
+        events.put(
+            (
+                "stats",
+                worker_id,
+                os.getpid(),
+                time.time(),
+                image_server.processed_images,
+            )
+        )
+
+    server.stop(GRACE_PERIOD).wait()
+
+
+class ServerLauncher:
+    """Runs several object detection server processes on the same port.
+
+    Workers share the port through SO_REUSEPORT, so the kernel spreads new
+    connections across them. Since a gRPC channel keeps its connection, clients
+    need several channels to use several workers. Each worker has its own model
+    and a fixed number of inference threads, and can be pinned to its own cores.
+
+    Crashed workers are restarted with exponential backoff. A worker that exits
+    more than `max_restarts` times in a row without ever becoming ready (e.g.
+    because its model cannot be loaded) stops the launcher with an error.
+
+    On SIGHUP, workers are restarted one at a time: the replacement is started
+    and warmed up before the old worker stops listening and finishes its
+    requests in flight, so the port stays served. A replacement that dies or is
+    not ready within the warm-up timeout aborts the restart, leaving the
+    remaining workers untouched.
+    """
+
+    def __init__(
+        self,
+        port: str,
+        num_workers: int,
+        model_name: str,
+        backend: str = "pipeline",
+        threads_per_worker: int = None,
+        pin_cpus: bool = False,
+        stats_interval: float = STATS_INTERVAL,
+        warm_up_timeout: float = WARM_UP_TIMEOUT,
+        max_restarts: int = MAX_RESTARTS,
+    ):
+        """
+        Args:
+            port: Port shared by the workers
+            num_workers: Number of worker processes
+            model_name: Object detection model to use
+            backend: Detector backend
+            threads_per_worker: Intra-op threads of each worker. Defaults to the
+                number of cores divided by the number of workers.
+            pin_cpus: If True, pin each worker to its own set of cores (Linux)
+            stats_interval: Seconds between throughput reports
+            warm_up_timeout: Seconds a replacement worker has to become ready
+                during a rolling restart
+            max_restarts: Maximum number of consecutive restarts of a worker that
+                never becomes ready
+        """
+        num_cpus = os.cpu_count() or 1
+        self.port = port
+        self.num_workers = num_workers
+        self.model_name = model_name
+        self.backend = backend
+        self.threads_per_worker = threads_per_worker or max(
+            1, num_cpus // num_workers
+        )
+        self.pin_cpus = pin_cpus
+        self.stats_interval = stats_interval
+        self.warm_up_timeout = warm_up_timeout
+        self.max_restarts = max_restarts
+
+        self.ctx = multiprocessing.get_context("spawn")
+        self.events = self.ctx.Queue()
+        self.workers = {}
+        # pid -> (time, processed images) of the last two reports
+        self.stats = {}
+        self.last_report = time.time()
+        # worker_id -> exits since the worker was last ready
+        self.failures = defaultdict(int)
+        # worker_id -> time at which a crashed worker is restarted
+        self.restart_at = {}
+        self.restart_requested = False
+        self.stopping = False
+        self.exit_code = 0
+
+    def worker_cpus(self, worker_id: int):
+        """Cores a worker is pinned to, or None if workers are not pinned."""
+        if not self.pin_cpus:
+            return None
+        num_cpus = os.cpu_count() or 1
+        first = worker_id * self.threads_per_worker
+        cpus = range(first, first + self.threads_per_worker)
+        return {cpu % num_cpus for cpu in cpus}
+
+    def start_worker(self, worker_id: int) -> multiprocessing.Process:
+        process = self.ctx.Process(
+            target=worker_main,
+            args=(
+                worker_id,
+                self.port,
+                self.model_name,
+                self.backend,
+                self.threads_per_worker,
+                self.worker_cpus(worker_id),
+                self.events,
+                self.stats_interval,
+            ),
+        )
+        process.start()
+        logger.info(f"Started worker {worker_id} (pid {process.pid})")
+        return process
+
+    def stop_worker(self, process: multiprocessing.Process):
+        """Stop a worker gracefully, or kill it after the grace period."""
+        process.terminate()
+        process.join(timeout=GRACE_PERIOD + 5.0)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        self.stats.pop(process.pid, None)
+
+    def poll(self, timeout: float):
+        """Handle at most one event from the workers.
+
+        Returns:
+            The event, or None if no event arrived within the timeout
+        """
+        try:
+            event = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        kind, worker_id, pid, report_time, processed = event
+        if kind == "ready":
+            logger.info(f"Worker {worker_id} (pid {pid}) is serving")
+            self.failures[worker_id] = 0
+        previous = self.stats.get(pid, [(report_time, processed)])[-1]
+        self.stats[pid] = [previous, (report_time, processed)]
+        return event
+
+    def report_throughput(self):
+        """Log the throughput of every worker and of the whole node."""
+        total = 0.0
+        for worker_id, process in sorted(self.workers.items()):
+            reports = self.stats.get(process.pid)
+            if not reports:
+                continue
+            (start_time, start_count), (end_time, end_count) = reports
+            throughput = (
+                (end_count - start_count) / (end_time - start_time)
+                if end_time > start_time
+                else 0.0
+            )
+            total += throughput
+            logger.info(
+                f"Worker {worker_id} (pid {process.pid}): {throughput:.2f} images/s, "
+                f"{end_count} images total"
+            )
+        logger.info(f"Node throughput: {total:.2f} images/s")
+
+    def supervise(self):
+        """Restart crashed workers, and report throughput when it is due."""
+        for worker_id, process in list(self.workers.items()):
+            if process.is_alive() or self.stopping:
+                continue
+            if worker_id in self.restart_at:
+                if time.time() >= self.restart_at[worker_id]:
+                    del self.restart_at[worker_id]
+                    self.workers[worker_id] = self.start_worker(worker_id)
+                continue
+
+            self.stats.pop(process.pid, None)
+            self.failures[worker_id] += 1
+            if self.failures[worker_id] > self.max_restarts:
+                logger.error(
+                    f"Worker {worker_id} exited {self.failures[worker_id]} times "
+                    "without becoming ready, giving up"
+                )
+                self.exit_code = 1
+                self.stopping = True
+                return
+
+            backoff = min(
+                RESTART_BACKOFF * 2 ** (self.failures[worker_id] - 1),
+                MAX_RESTART_BACKOFF,
+            )
+            logger.warning(
+                f"Worker {worker_id} (pid {process.pid}) exited with code "
+                f"{process.exitcode}, restarting in {backoff:.0f} s"
+            )
+            self.restart_at[worker_id] = time.time() + backoff
+
+        if time.time() - self.last_report >= self.stats_interval:
+            self.report_throughput()
+            self.last_report = time.time()
+
+    def rolling_restart(self):
+        """Replace the workers one at a time without leaving the port unserved."""
+        logger.info("Rolling restart")
+        for worker_id in sorted(self.workers):
+            replacement = self.start_worker(worker_id)
+            warm_up_deadline = time.time() + self.warm_up_timeout
+            while not self.stopping:
+                event = self.poll(timeout=1.0)
+                if event and event[0] == "ready" and event[2] == replacement.pid:
+                    break
+                if not replacement.is_alive():
+                    logger.warning(
+                        f"Replacement of worker {worker_id} exited with code "
+                        f"{replacement.exitcode}, aborting restart"
+                    )
+                    return
+                if time.time() > warm_up_deadline:
+                    logger.warning(
+                        f"Replacement of worker {worker_id} not ready after "
+                        f"{self.warm_up_timeout} s, aborting restart"
+                    )
+                    self.stop_worker(replacement)
+                    return
+                # the other workers are still supervised while the replacement
+                # warms up
+                self.supervise()
+            if self.stopping:
+                self.stop_worker(replacement)
+                return
+
+            self.stop_worker(self.workers[worker_id])
+            self.workers[worker_id] = replacement
+            self.restart_at.pop(worker_id, None)
+
+    def run(self) -> int:
+        """Start the workers and supervise them until SIGINT or SIGTERM.
+
+        Returns:
+            The exit code: 1 if a worker kept failing, 0 otherwise
+        """
+
+        def request_restart(signum, frame):
+            self.restart_requested = True
+
+        def request_stop(signum, frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGHUP, request_restart)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        print(
+            f"------------------start {self.num_workers} GRPC server workers on port "
+            f"{self.port} with model {self.model_name} ({self.backend} backend, "
+            f"{self.threads_per_worker} threads each)"
+        )
+        for worker_id in range(self.num_workers):
+            self.workers[worker_id] = self.start_worker(worker_id)
+
+        self.last_report = time.time()
+        while not self.stopping:
+            self.poll(timeout=1.0)
+
+            if self.restart_requested:
+                self.restart_requested = False
+                self.rolling_restart()
+
+            self.supervise()
+
+        logger.info("Stopping workers")
+        # signal all workers first, so that they drain their requests in parallel
+        for process in self.workers.values():
+            process.terminate()
+        for process in self.workers.values():
+            self.stop_worker(process)
+        return self.exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Multi-process GRPC Object Detection Server"
+    )
+    parser.add_argument(
+        "--port", type=str, default="12345", help="Port to run the server on"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, (os.cpu_count() or 1) // 4),
+        help="Number of server worker processes",
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="facebook/detr-resnet-50",
+        help="Object detection model to use (facebook/detr-resnet-50 or facebook/detr-resnet-101)",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=BACKENDS,
+        default="pipeline",
+        help="Detector backend (quantized and onnx are optimized for CPUs)",
+    )
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=None,
+        help="Inference threads of each worker (default: cores / workers)",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        help="Pin each worker to its own set of cores (Linux only)",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=STATS_INTERVAL,
+        help="Seconds between throughput reports",
+    )
+    parser.add_argument(
+        "--warm-up-timeout",
+        type=float,
+        default=WARM_UP_TIMEOUT,
+        help="Seconds a replacement worker has to become ready on SIGHUP",
+    )
+    parser.add_argument(
+        "--max-restarts",
+        type=int,
+        default=MAX_RESTARTS,
+        help="Consecutive restarts of a worker that never becomes ready before "
+        "giving up",
+    )
+    args = parser.parse_args()
+
+    launcher = ServerLauncher(
+        port=args.port,
+        num_workers=args.workers,
+        model_name=args.model,
+        backend=args.backend,
+        threads_per_worker=args.threads_per_worker,
+        pin_cpus=args.pin_cpus,
+        stats_interval=args.stats_interval,
+        warm_up_timeout=args.warm_up_timeout,
+        max_restarts=args.max_restarts,
+    )
+    sys.exit(launcher.run())
@@ -2,6 +2,7 @@ import argparse
 import io
 import logging
 import os
+import threading
 import time
 import warnings
 from concurrent import futures
@@ -12,9 +13,10 @@ warnings.filterwarnings("ignore", category=UserWarning)
 
 import grpc
 import numpy as np
+from core.delta import DeltaDecoder, EncodedFrame
+from core.detectors import BACKENDS, create_detector, warm_up
 from PIL import Image
 from protos import object_detection_pb2, object_detection_pb2_grpc
-from transformers import pipeline
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,7 +27,10 @@ RESPONSE = "".join("A" for i in range(1000))
 
 
 def process_image(image_data: bytes, obj_detector):
-    im = Image.open(io.BytesIO(image_data))
+    return detect_objects(Image.open(io.BytesIO(image_data)), obj_detector)
+
+
+def detect_objects(im: Image.Image, obj_detector):
     logger.info("running object detector on server...")
     start_time = time.time()
     objs = obj_detector(im)
@@ -34,21 +39,97 @@ def process_image(image_data: bytes, obj_detector):
     return objs
 
 
+def decode_frame(request, decoders):
+    """Reconstruct a delta-encoded frame from the state of its stream.
+
+    Args:
+        request: Request carrying a keyframe or a delta
+        decoders: Dictionary of DeltaDecoders by stream ID
+
+    Returns:
+        The frame as an image, or None if the client must resync
+    """
+    encoded = EncodedFrame(
+        seq=request.frame_seq,
+        keyframe=request.keyframe,
+        image_data=request.image_data,
+        base_seq=request.delta.base_seq,
+        block_size=request.delta.block_size,
+        block_mask=request.delta.block_mask,
+        block_data=request.delta.block_data,
+    )
+    decoder = decoders.setdefault(request.stream_id, DeltaDecoder())
+    frame = decoder.decode(encoded)
+    return None if frame is None else Image.fromarray(frame)
+
+
 def process_dummy_image(image_data):
     return np.frombuffer(image_data.encode(encoding=ENCODING), dtype=np.uint8)
 
 
 class ImageServer(object_detection_pb2_grpc.GRPCImageServicer):
-    def __init__(self, model_name: str):
-        self.obj_detector = pipeline("object-detection", model=model_name)
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "pipeline",
+        intra_op_threads: int = None,
+        inter_op_threads: int = None,
+    ):
+        # the model is loaded in the background so that the server can start
+        # answering readiness checks right away
+        self.obj_detector = None
+        self.ready = threading.Event()
+        self.failed = threading.Event()
+        self.processed_images = 0
+        self.stats_lock = threading.Lock()
+        threading.Thread(
+            target=self.load_detector,
+            args=(model_name, backend, intra_op_threads, inter_op_threads),
+            daemon=True,
+        ).start()
+
+    def load_detector(self, model_name, backend, intra_op_threads, inter_op_threads):
+        start_time = time.time()
+        try:
+            self.obj_detector = create_detector(
+                backend,
+                model_name=model_name,
+                intra_op_threads=intra_op_threads,
+                inter_op_threads=inter_op_threads,
+            )
+            warm_up(self.obj_detector)
+        except Exception:
+            logger.exception(f"Failed to load model {model_name}")
+            self.failed.set()
+            return
+        self.ready.set()
+        logger.info(f"Model ready after {time.time() - start_time:.3f} s")
+
+    def count_processed(self, num_images: int = 1):
+        with self.stats_lock:
+            self.processed_images += num_images
+
+    def check_ready(self, context):
+        """Abort the RPC with UNAVAILABLE unless the model is ready."""
+        if self.failed.is_set():
+            context.abort(grpc.StatusCode.UNAVAILABLE, "Model failed to load")
+        if not self.ready.is_set():
+            context.abort(grpc.StatusCode.UNAVAILABLE, "Model is still loading")
+
+    def CheckReadiness(self, request, context):
+        return object_detection_pb2.ReadinessResponse(
+            ready=self.ready.is_set(), failed=self.failed.is_set()
+        )
 
     def ProcessImageSync(self, request, context):
+        self.check_ready(context)
         logger.info(
             "ProcessImageSync called by client with the message len: %d",
             len(request.image_data),
         )
         recv_time = time.time()
         detected_objects = process_image(request.image_data, self.obj_detector)
+        self.count_processed()
         response = object_detection_pb2.Response(
             detected_objects=detected_objects,
             req_id=request.req_id,
@@ -56,16 +137,53 @@ class ImageServer(object_detection_pb2_grpc.GRPCImageServicer):
         )
         return response
 
+    def ProcessImageBatch(self, request, context):
+        self.check_ready(context)
+        logger.info(
+            "ProcessImageBatch called by client with %d images", len(request.requests)
+        )
+        responses = []
+        for image_request in request.requests:
+            recv_time = time.time()
+            detected_objects = process_image(
+                image_request.image_data, self.obj_detector
+            )
+            responses.append(
+                object_detection_pb2.Response(
+                    detected_objects=detected_objects,
+                    req_id=image_request.req_id,
+                    recv_time=recv_time,
+                )
+            )
+        self.count_processed(len(responses))
+        return object_detection_pb2.BatchResponse(responses=responses)
+
     def ProcessImageStreaming(self, request_iterator, context):
+        self.check_ready(context)
+        # delta-encoding state lives as long as the stream, so a new stream
+        # always starts with a keyframe
+        decoders = {}
         for request in request_iterator:
             recv_time = time.time()
             time.sleep(1.0)
             logger.info(
                 "recv from client message size %d id %d",
-                len(request.image_data),
+                request.ByteSize(),
                 request.req_id,
             )
-            detected_objects = process_image(request.image_data, self.obj_detector)
+            if request.keyframe or request.HasField("delta"):
+                im = decode_frame(request, decoders)
+                if im is None:
+                    yield object_detection_pb2.Response(
+                        req_id=request.req_id,
+                        recv_time=recv_time,
+                        resync_required=True,
+                    )
+                    continue
+                detected_objects = detect_objects(im, self.obj_detector)
+            else:
+                detected_objects = process_image(request.image_data, self.obj_detector)
+            self.count_processed()
             yield object_detection_pb2.Response(
                 detected_objects=detected_objects,
                 req_id=request.req_id,
@@ -73,20 +191,43 @@ class ImageServer(object_detection_pb2_grpc.GRPCImageServicer):
             )
 
 
-def serve(port: str, model_name: str):
+def create_server(
+    port: str, image_server: ImageServer, reuse_port: bool = False
+) -> grpc.Server:
+    """Create a gRPC server for an ImageServer, without starting it.
+
+    Args:
+        port: Port to run the server on
+        image_server: Servicer handling the requests
+        reuse_port: If True, several processes can listen on the same port, and
+            the kernel balances new connections across them
+    """
     options = [
         ("grpc.max_message_length", 1024 * 1024 * 1024),
         ("grpc.max_send_message_length", 1024 * 1024 * 1024),
         ("grpc.max_receive_message_length", 1024 * 1024 * 1024),
         ("grpc.http2.write_buffer_size", 1),
     ]
+    if reuse_port:
+        options.append(("grpc.so_reuseport", 1))
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=3), options=options)
-    object_detection_pb2_grpc.add_GRPCImageServicer_to_server(
-        ImageServer(model_name), server
-    )
+    object_detection_pb2_grpc.add_GRPCImageServicer_to_server(image_server, server)
     server.add_insecure_port("[::]:" + port)
+    return server
+
+
+def serve(
+    port: str,
+    model_name: str,
+    backend: str = "pipeline",
+    intra_op_threads: int = None,
+    inter_op_threads: int = None,
+):
+    server = create_server(
+        port, ImageServer(model_name, backend, intra_op_threads, inter_op_threads)
+    )
     print(
-        f"------------------start Python GRPC server on port {port} with model {model_name}"
+        f"------------------start Python GRPC server on port {port} with model {model_name} ({backend} backend)"
     )
     server.start()
     server.wait_for_termination()
@@ -104,5 +245,30 @@ if __name__ == "__main__":
         default="facebook/detr-resnet-50",
         help="Object detection model to use (facebook/detr-resnet-50 or facebook/detr-resnet-101)",
     )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=BACKENDS,
+        default="pipeline",
+        help="Detector backend (quantized and onnx are optimized for CPUs)",
+    )
+    parser.add_argument(
+        "--intra-op-threads",
+        type=int,
+        default=None,
+        help="Threads used within an operator during inference",
+    )
+    parser.add_argument(
+        "--inter-op-threads",
+        type=int,
+        default=None,
+        help="Threads used to run independent operators in parallel",
+    )
     args = parser.parse_args()
-    serve(args.port, args.model)
+    serve(
+        args.port,
+        args.model,
+        args.backend,
+        args.intra_op_threads,
+        args.inter_op_threads,
+    )
@@ -20,4 +20,7 @@ setup(
         "timm>=1.0.15",
         "torchvision>=0.22.0",
     ],
+    extras_require={
+        "onnx": ["onnx>=1.16.0", "onnxruntime>=1.18.0"],
+    },
 )
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from core.cloud_executor import Deadline, RpcHandle
+from core.coordinator import SpeculativeOperator
+
+
+class ColdOperator(SpeculativeOperator[int, int]):
+    """Local execution only becomes ready once `local_ready` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.local_ready = threading.Event()
+
+    def is_local_ready(self):
+        return self.local_ready.is_set()
+
+    def execute_local(self, input_message: int) -> int:
+        return input_message
+
+
+class ColdRpcHandle(RpcHandle):
+    def __init__(self):
+        super().__init__()
+        self.ready = False
+
+    @property
+    def stub(self):
+        return None
+
+    def __call__(self, rpc_request):
+        return rpc_request
+
+    def is_ready(self):
+        return self.ready
+
+
+def test_process_message_fails_while_nothing_is_ready():
+    with pytest.raises(Exception, match="Neither local nor cloud"):
+        ColdOperator().process_message(0, 0)
+
+
+def test_wait_until_ready_times_out():
+    assert not ColdOperator().wait_until_ready(timeout=0.2)
+
+
+def test_wait_until_local_ready():
+    operator = ColdOperator()
+    threading.Timer(0.2, operator.local_ready.set).start()
+    assert operator.wait_until_ready(timeout=5.0)
+    assert operator.process_message(0, 7)[2] == 7
+
+
+def test_wait_until_cloud_ready():
+    operator = ColdOperator()
+    handle = ColdRpcHandle()
+    operator.use_cloud(
+        handle,
+        lambda timestamp, message: (message, Deadline.relative(1.0)),
+        lambda response: response,
+        priority=0,
+    )
+    threading.Timer(0.2, setattr, (handle, "ready", True)).start()
+    assert operator.wait_until_ready(timeout=5.0)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from core.delta import DeltaDecoder, DeltaEncoder
+
+# odd sizes, so that frames do not divide into whole blocks
+HEIGHT, WIDTH = 37, 53
+
+
+def make_frames(count, seed=0):
+    """Frames that differ from the previous one in a small patch."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    frames = [frame]
+    for _ in range(count - 1):
+        frame = frame.copy()
+        row, col = rng.integers(0, HEIGHT - 4), rng.integers(0, WIDTH - 4)
+        frame[row : row + 4, col : col + 4] = rng.integers(0, 256, (4, 4, 3))
+        frames.append(frame)
+    return frames
+
+
+def test_round_trip():
+    encoder, decoder = DeltaEncoder(block_size=16, keyframe_interval=5), DeltaDecoder()
+    for frame in make_frames(12):
+        decoded = decoder.decode(encoder.encode(frame))
+        np.testing.assert_array_equal(decoded, frame)
+
+    stats = encoder.stats()
+    assert stats["keyframes"] == 3
+    assert stats["deltas"] == 9
+
+
+def test_block_size_change():
+    frames = make_frames(3)
+    large, small = DeltaEncoder(block_size=16), DeltaEncoder(block_size=8)
+    decoder = DeltaDecoder()
+    decoder.decode(large.encode(frames[0]))
+    np.testing.assert_array_equal(decoder.decode(large.encode(frames[1])), frames[1])
+
+    # the second encoder reaches the same reference, with smaller blocks
+    small.encode(frames[0])
+    small.encode(frames[1])
+    delta = small.encode(frames[2])
+    assert not delta.keyframe and delta.block_size == 8
+    np.testing.assert_array_equal(decoder.decode(delta), frames[2])
+
+
+def test_missing_base_requires_resync():
+    frames = make_frames(4)
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoder.decode(encoder.encode(frames[0]))
+    encoder.encode(frames[1])  # lost on the way
+
+    assert decoder.decode(encoder.encode(frames[2])) is None
+
+    encoder.reset()
+    keyframe = encoder.encode(frames[3])
+    assert keyframe.keyframe
+    np.testing.assert_array_equal(decoder.decode(keyframe), frames[3])
+
+
+def test_delta_before_keyframe_requires_resync():
+    encoder = DeltaEncoder()
+    encoder.encode(make_frames(1)[0])
+    delta = encoder.encode(make_frames(2)[1])
+    assert not delta.keyframe
+    assert DeltaDecoder().decode(delta) is None
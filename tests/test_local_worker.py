@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+from core.local_worker import LocalWorker
+
+
+def create_echo_handler():
+    def echo(data):
+        if data == b"crash":
+            os._exit(1)
+        if data == b"hang":
+            time.sleep(3600)
+        return bytes(data)
+
+    return echo
+
+
+def create_broken_handler():
+    os._exit(1)
+
+
+@pytest.fixture
+def worker():
+    worker = LocalWorker(
+        create_echo_handler, num_slots=1, slot_size=1024, stall_timeout=0.5
+    )
+    assert worker.wait_until_ready()
+    yield worker
+    worker.close()
+
+
+def test_echo(worker):
+    assert worker(b"frame", timeout=10.0) == b"frame"
+
+
+def test_crashed_worker_is_restarted(worker):
+    with pytest.raises(RuntimeError, match="crashed"):
+        worker(b"crash", timeout=10.0)
+
+    assert worker.wait_until_ready()
+    assert worker(b"frame", timeout=10.0) == b"frame"
+    assert worker.restarts == 1
+
+
+def test_hung_worker_is_restarted(worker):
+    hung = worker.submit(b"hang")
+    with pytest.raises(TimeoutError):
+        worker.submit(b"frame", timeout=0.1)
+
+    with pytest.raises(RuntimeError, match="crashed"):
+        hung.result(timeout=10.0)
+    assert worker.wait_until_ready()
+    assert worker(b"frame", timeout=10.0) == b"frame"
+    assert worker.restarts == 1
+
+
+def test_gives_up_after_max_restarts():
+    worker = LocalWorker(create_broken_handler, slot_size=1024, max_restarts=2)
+    assert not worker.wait_until_ready()
+    assert worker.restarts == 2
+    with pytest.raises(RuntimeError, match="not running"):
+        worker.submit(b"frame")
+    worker.close()
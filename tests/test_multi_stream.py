@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.cloud_executor import Deadline
+from core.coordinator import SpeculativeOperator
+from core.multi_stream import MultiStreamOperator
+
+
+class EchoOperator(SpeculativeOperator[int, int]):
+    """Returns its input after a short, input-dependent delay."""
+
+    def execute_local(self, input_message: int) -> int:
+        time.sleep(0.001 * (input_message % 3))
+        return input_message
+
+
+def test_concurrent_process_message_returns_own_result():
+    operator = EchoOperator()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {
+            k: executor.submit(operator.process_message, k, k) for k in range(400)
+        }
+    for k, future in futures.items():
+        _, _, value = future.result()
+        assert value == k
+
+
+def test_multi_stream_results_match_inputs():
+    multi_stream = MultiStreamOperator(EchoOperator(), max_workers=8)
+    for stream_id in range(4):
+        multi_stream.add_stream(stream_id, max_in_flight=2, max_pending=1000)
+
+    futures = [
+        (k, multi_stream.submit(k % 4, k, k, Deadline.relative(10.0)))
+        for k in range(400)
+    ]
+    for k, future in futures:
+        _, _, value = future.result(timeout=10.0)
+        assert value == k
+
+    multi_stream.close()
+    stats = multi_stream.stats()
+    assert sum(stream["processed"] for stream in stats.values()) == 400
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from core.cloud_executor import Deadline, RpcHandle
+from core.coordinator import SpeculativeOperator
+
+
+class EchoOperator(SpeculativeOperator[int, int]):
+    def execute_local(self, input_message: int) -> int:
+        return input_message
+
+
+class EchoRpcHandle(RpcHandle):
+    """Echoes its requests after `delay` seconds, or fails every batch if `broken`."""
+
+    def __init__(self, broken: bool = False, delay: float = 0.0):
+        super().__init__()
+        self.broken = broken
+        self.delay = delay
+        self.batches = 0
+
+    @property
+    def stub(self):
+        return None
+
+    def __call__(self, rpc_request):
+        return rpc_request
+
+    def call_batch(self, rpc_requests):
+        self.batches += 1
+        if self.broken:
+            raise Exception("server unavailable")
+        time.sleep(self.delay)
+        return rpc_requests
+
+
+def echo_operator(*handles):
+    operator = EchoOperator()
+    for priority, handle in enumerate(handles):
+        operator.use_cloud(
+            handle,
+            lambda timestamp, message: (message, Deadline.relative(1.0)),
+            lambda response: response,
+            priority=priority,
+        )
+    return operator
+
+
+def test_failed_batches_are_retried_on_another_lane():
+    broken, healthy = EchoRpcHandle(broken=True), EchoRpcHandle()
+    operator = echo_operator(broken, healthy)
+
+    messages = [(k, k) for k in range(64)]
+    assert operator.process_batch(messages, batch_size=4) == list(range(64))
+    # the broken lane gets no new batches once one of its batches failed
+    assert 0 < broken.batches <= 2
+    assert healthy.batches >= 16
+
+
+def test_retries_do_not_starve_healthy_lanes():
+    # a fast-failing lane next to a slower healthy one used to leave retries
+    # waiting for lanes held by batches that could not get a thread
+    for _ in range(3):
+        operator = echo_operator(EchoRpcHandle(broken=True), EchoRpcHandle(delay=0.01))
+        messages = [(k, k) for k in range(200)]
+        assert operator.process_batch(
+            messages, batch_size=1, lane_timeout=1.0
+        ) == list(range(200))
+
+
+def test_gives_up_once_every_lane_failed():
+    operator = echo_operator(EchoRpcHandle(broken=True), EchoRpcHandle(broken=True))
+
+    with pytest.raises(Exception, match="server unavailable|Every implementation"):
+        operator.process_batch([(k, k) for k in range(8)], batch_size=4)
+
+
+def test_lane_timeout():
+    handle = EchoRpcHandle()
+    handle.is_ready = lambda: False
+    operator = echo_operator(handle)
+
+    with pytest.raises(Exception, match="No implementation available"):
+        operator.process_batch([(0, 0)], lane_timeout=0.2)